@@ -1 +1 @@
-from . import stat_tests, revenue
\ No newline at end of file
+from . import stat_tests, revenue, subscriptions, metric_store, streaming, cache, sufficient_stats, batch, resampling, sequential, normality, group_index
\ No newline at end of file
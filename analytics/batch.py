@@ -0,0 +1,224 @@
+from concurrent.futures import ProcessPoolExecutor
+import time
+import numpy as np
+import pandas as pd
+from . import stat_tests as st
+from .sufficient_stats import GroupStats, ContingencyStats, group_sufficient_statistics
+
+# The parameter of every test that receives the shared aggregate, and the aggregate it needs.
+# Tests without an entry read the raw rows and run whole on a worker.
+_AGGREGATE_TESTS = {
+    'z_test': 'stats',
+    'unpaired_t_test': 'stats',
+    'one_way_anova': 'group_stats',
+    'two_way_anova': 'cell_stats',
+    'n_way_anova': 'cell_stats',
+    'one_sample_proportion_test': 'stats',
+    'two_sample_proportion_test': ('stats1', 'stats2'),
+    'chi_square_goodness_of_fit_test': 'stats',
+}
+_RAW_TESTS = ('paired_t_test', 'chi_square_independence_test')
+
+
+def _aggregate_keys(test, spec):
+    """
+    The aggregates a spec needs, as hashable keys: ('group', category_column, numerical_column) for GroupStats,
+    ('cells', factors, numerical_column) for n-way cell statistics and ('counts', column) for ContingencyStats.
+    """
+
+    if test == 'z_test':
+        return [('group', None, spec['column'])]
+    if test in ('unpaired_t_test', 'one_way_anova'):
+        return [('group', spec['category_column'], spec['numerical_column'])]
+    if test in ('two_way_anova', 'n_way_anova'):
+        return [('cells', tuple(sorted(spec['dictionary_with_groups'])), spec['numerical_column'])]
+    if test == 'one_sample_proportion_test':
+        return [('counts', spec['categorical_column'])]
+    if test == 'two_sample_proportion_test':
+        return [('counts', spec['categorical_column1']), ('counts', spec['categorical_column2'])]
+    if test == 'chi_square_goodness_of_fit_test':
+        return [('counts', spec['category_column'])]
+
+
+def _key_columns(key):
+    if key[0] == 'group':
+        return [column for column in key[1:] if column is not None]
+    if key[0] == 'cells':
+        return list(key[1]) + [key[2]]
+    return [key[1]]
+
+
+def _raw_columns(test, spec):
+    if test == 'paired_t_test':
+        return [spec['id_column'], spec['period_column'], spec['numerical_column']]
+    return list(dict.fromkeys([spec['group_column'], spec['category_column'], spec['value_column']]))
+
+
+def _compute_aggregate(key, df):
+    """
+    Builds one shared aggregate from the columns it reads. Runs on a worker.
+    """
+
+    start = time.perf_counter()
+    if key[0] == 'group' and key[1] is None:
+        aggregate = GroupStats.from_array(df[key[2]].dropna())
+    elif key[0] == 'group':
+        aggregate = GroupStats.from_df(df=df, category_column=key[1], numerical_column=key[2])
+    elif key[0] == 'cells':
+        aggregate = GroupStats(group_sufficient_statistics(df=df, category_column=list(key[1]),
+                                                           numerical_column=key[2]))
+    else:
+        aggregate = ContingencyStats.from_df(df=df, row_column=key[1])
+
+    return aggregate, time.perf_counter() - start
+
+
+def _run_raw_test(test, spec, df):
+    """
+    Runs a test that reads the raw rows. Runs on a worker.
+    """
+
+    start = time.perf_counter()
+    result = getattr(st, test + '_for_df')(df=df, **spec)
+
+    return result, time.perf_counter() - start
+
+
+def _result_rows(name, test, result):
+    """
+    Flattens the result of a test into (name, test, effect, p-value) rows. Two-way and n-way ANOVA give a row per
+    factor and one for the interaction, the other tests a single row.
+    """
+
+    if isinstance(result, dict):
+        return [(name, test, effect, p_value) for effect, p_value in result.items()]
+    if isinstance(result, list):
+        return [(name, test, effect, p_value) for effect, p_value in result]
+    return [(name, test, None, result)]
+
+
+def holm_adjustment(p_values):
+    """
+    Adjusts p-values for multiple comparisons with the Holm step-down method, which controls the family-wise error
+    rate. Missing p-values are left out of the family and stay missing.
+
+    :param p_values: array-like, The p-values
+    :return: numpy.ndarray, The adjusted p-values, in the order of p_values
+    """
+
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full(len(p_values), np.nan)
+    observed = np.flatnonzero(~np.isnan(p_values))
+    m = len(observed)
+    if m == 0:
+        return adjusted
+
+    order = observed[np.argsort(p_values[observed], kind='stable')]
+    steps = np.maximum.accumulate((m - np.arange(m)) * p_values[order])
+    adjusted[order] = np.minimum(steps, 1)
+
+    return adjusted
+
+
+def benjamini_hochberg_adjustment(p_values):
+    """
+    Adjusts p-values for multiple comparisons with the Benjamini-Hochberg step-up method, which controls the false
+    discovery rate. Missing p-values are left out of the family and stay missing.
+
+    :param p_values: array-like, The p-values
+    :return: numpy.ndarray, The adjusted p-values, in the order of p_values
+    """
+
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full(len(p_values), np.nan)
+    observed = np.flatnonzero(~np.isnan(p_values))
+    m = len(observed)
+    if m == 0:
+        return adjusted
+
+    order = observed[np.argsort(p_values[observed], kind='stable')]
+    steps = p_values[order] * m / np.arange(1, m + 1)
+    adjusted[order] = np.minimum(np.minimum.accumulate(steps[::-1])[::-1], 1)
+
+    return adjusted
+
+
+def run_tests(df, specs, max_workers=None):
+    """
+    Runs a batch of hypothesis tests described by specs and collects their p-values in one table.
+
+    Every spec is a dict with the name of a test from stat_tests ('z_test', 'unpaired_t_test', 'paired_t_test',
+    'one_way_anova', 'two_way_anova', 'n_way_anova', 'one_sample_proportion_test', 'two_sample_proportion_test',
+    'chi_square_independence_test' or 'chi_square_goodness_of_fit_test') under 'test', an optional 'name', and the
+    other arguments of the matching *_for_df function, e.g.
+    {'test': 'one_way_anova', 'category_column': 'Country', 'group_of_interest': countries,
+    'numerical_column': 'Monthly Revenue'}.
+
+    The grouped aggregates (GroupStats, cell statistics, ContingencyStats) are built once for all specs reading the
+    same columns. Aggregates and the tests that need the raw rows are independent of each other and run on a process
+    pool, the tests on aggregates then run in this process, as they only touch one row per group.
+
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param specs: list of dict, The tests to run
+    :param max_workers: int, optional, The number of worker processes. 0 or 1 runs everything in this process.
+    Defaults to the number of processors.
+    :return: pandas.DataFrame with a row per p-value (two-way and n-way ANOVA give one per effect) and columns 'Name',
+    'Test', 'Effect', 'P-Value', 'Holm P-Value', 'BH P-Value', 'Aggregate Time' (seconds spent building the shared
+    aggregates the test read) and 'Test Time' (seconds spent in the test itself)
+    """
+
+    parsed_specs = []
+    aggregate_keys = {}
+    for i, spec in enumerate(specs):
+        arguments = dict(spec)
+        test = arguments.pop('test')
+        name = arguments.pop('name', '{} #{}'.format(test, i))
+        if test in _AGGREGATE_TESTS:
+            keys = _aggregate_keys(test, arguments)
+            for key in keys:
+                aggregate_keys.setdefault(key, _key_columns(key))
+        elif test in _RAW_TESTS:
+            keys = None
+        else:
+            raise ValueError("Invalid test. Supported tests are {}".format(
+                ', '.join(list(_AGGREGATE_TESTS) + list(_RAW_TESTS))))
+        parsed_specs.append((name, test, arguments, keys))
+
+    raw_specs = [(i, test, arguments) for i, (name, test, arguments, keys) in enumerate(parsed_specs) if keys is None]
+
+    if max_workers is not None and max_workers <= 1:
+        aggregates = {key: _compute_aggregate(key, df[columns]) for key, columns in aggregate_keys.items()}
+        raw_results = {i: _run_raw_test(test, arguments, df[_raw_columns(test, arguments)])
+                       for i, test, arguments in raw_specs}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            aggregate_futures = {key: executor.submit(_compute_aggregate, key, df[columns])
+                                 for key, columns in aggregate_keys.items()}
+            raw_futures = {i: executor.submit(_run_raw_test, test, arguments, df[_raw_columns(test, arguments)])
+                           for i, test, arguments in raw_specs}
+            aggregates = {key: future.result() for key, future in aggregate_futures.items()}
+            raw_results = {i: future.result() for i, future in raw_futures.items()}
+
+    rows = []
+    for i, (name, test, arguments, keys) in enumerate(parsed_specs):
+        if keys is None:
+            result, test_time = raw_results[i]
+            aggregate_time = 0.0
+        else:
+            parameters = _AGGREGATE_TESTS[test]
+            if isinstance(parameters, str):
+                parameters = (parameters,)
+            for parameter, key in zip(parameters, keys):
+                arguments[parameter] = aggregates[key][0]
+            aggregate_time = sum(aggregates[key][1] for key in keys)
+            start = time.perf_counter()
+            result = getattr(st, test + '_for_df')(df=None, **arguments)
+            test_time = time.perf_counter() - start
+        for row in _result_rows(name, test, result):
+            rows.append(row + (aggregate_time, test_time))
+
+    results = pd.DataFrame(rows, columns=['Name', 'Test', 'Effect', 'P-Value', 'Aggregate Time', 'Test Time'])
+    results.insert(4, 'Holm P-Value', holm_adjustment(results['P-Value']))
+    results.insert(5, 'BH P-Value', benjamini_hochberg_adjustment(results['P-Value']))
+
+    return results
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import functools
+import hashlib
+import inspect
+import pandas as pd
+
+_settings = {'enabled': False, 'maxsize': 128}
+_stats = {'hits': 0, 'misses': 0}
+_entries = OrderedDict()
+
+
+def enable_cache(maxsize=128):
+    """
+    Turns on memoization of the revenue metric functions.
+
+    :param maxsize: int, optional, The number of results to keep before evicting the least recently used one.
+    Defaults to 128.
+    """
+
+    _settings['enabled'] = True
+    _settings['maxsize'] = maxsize
+    _evict()
+
+
+def disable_cache():
+    """
+    Turns off memoization of the revenue metric functions and drops the cached results.
+    """
+
+    _settings['enabled'] = False
+    clear_cache()
+
+
+def clear_cache():
+    """
+    Drops the cached results and resets the hit and miss counters.
+    """
+
+    _entries.clear()
+    _stats['hits'] = 0
+    _stats['misses'] = 0
+
+
+def cache_info():
+    """
+    Describes the state of the cache.
+
+    :return: dict, Whether the cache is enabled, its hits, misses, current size and maximum size
+    """
+
+    return {'enabled': _settings['enabled'], 'hits': _stats['hits'], 'misses': _stats['misses'],
+            'size': len(_entries), 'maxsize': _settings['maxsize']}
+
+
+def fingerprint(df, columns):
+    """
+    Calculates a content fingerprint of the given columns of a dataframe.
+
+    :param df: pandas.DataFrame, The dataframe to fingerprint
+    :param columns: list, The columns to include in the fingerprint
+    :return: str, The fingerprint, equal for dataframes with the same values in these columns
+    """
+
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update(repr([(column, str(df[column].dtype)) for column in columns]).encode())
+
+    return digest.hexdigest()
+
+
+def _evict():
+    while len(_entries) > _settings['maxsize']:
+        _entries.popitem(last=False)
+
+
+def _argument_key(value):
+    try:
+        hash(value)
+    except TypeError:
+        value = repr(value)
+    return value
+
+
+def memoize(*column_parameters):
+    """
+    Memoizes a function taking a dataframe or a SubscriptionFrame as 'df', while the cache is enabled.
+    The key is the fingerprint of the columns named by column_parameters, or of the whole SubscriptionFrame,
+    plus all other call arguments.
+
+    :param column_parameters: str, The names of the function parameters that hold the column names it reads
+    :return: decorator
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _settings['enabled']:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            df = arguments.pop('df')
+            if isinstance(df, pd.DataFrame):
+                columns = list(dict.fromkeys(arguments[parameter] for parameter in column_parameters
+                                             if arguments.get(parameter)))
+                df_fingerprint = fingerprint(df, columns)
+            else:
+                df_fingerprint = df.fingerprint()
+
+            key = (func.__module__, func.__qualname__, df_fingerprint,
+                   tuple((name, _argument_key(value)) for name, value in arguments.items()))
+            if key in _entries:
+                _stats['hits'] += 1
+                _entries.move_to_end(key)
+                return _entries[key]
+
+            _stats['misses'] += 1
+            result = func(df=df, **arguments)
+            _entries[key] = result
+            _evict()
+
+            return result
+
+        return wrapper
+
+    return decorator
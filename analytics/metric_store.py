@@ -0,0 +1,217 @@
+from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
+from . import subscriptions as sb
+from .revenue import timespan_to_relativedelta
+
+
+def _merge_sorted(index, new_keys):
+    """
+    Inserts new keys into a sorted DatetimeIndex. Only the new keys are sorted, and they are placed by binary search,
+    so the existing history is copied once and never re-sorted.
+    """
+
+    new_keys = np.sort(np.asarray(new_keys, dtype='datetime64[ns]'))
+    existing = index.to_numpy(dtype='datetime64[ns]')
+
+    return pd.DatetimeIndex(np.insert(existing, np.searchsorted(existing, new_keys), new_keys))
+
+
+class MetricStore:
+    """
+    Keeps the aggregates behind churn rate, ARPU and LTV and updates them with appended payment batches.
+    Appending a batch costs time proportional to the batch, and the metrics give the same values as
+    churn_rate_calculation, arpu_calculation and ltv_calculation on all payments appended so far.
+
+    State kept per payment date: revenue sum, set of paying users and the (user, Last Day) intervals opened that day.
+    State kept per user: the latest Last Day, with the number of users per latest Last Day for the 'whole' churn rate.
+    The payment dates and Last Days are kept as sorted DatetimeIndexes. The new dates of a batch are sorted on their
+    own and inserted by binary search.
+
+    Payments with a missing user or payment date are skipped, so unlike arpu_calculation over the whole period,
+    their users do not count in the ARPU denominator.
+    """
+
+    def __init__(self, revenue, user_id, plan_duration, date_column):
+        """
+        :param revenue: str, The column name in the payment batches that represents the revenue
+        :param user_id: str, The column name in the payment batches that represents unique user identifiers
+        :param plan_duration: str, The column name in the payment batches that represents the plan duration
+        :param date_column: str, The column name in the payment batches that represents the payment dates
+        """
+
+        self.revenue = revenue
+        self.user_id = user_id
+        self.plan_duration = plan_duration
+        self.date_column = date_column
+
+        self.total_revenue = 0.0
+        self.users = set()
+        self.latest_payment = None
+        self.longest_plan = 0
+
+        self.payment_dates = pd.DatetimeIndex([])
+        self.revenue_by_date = {}
+        self.users_by_date = {}
+        self.intervals_by_date = {}
+
+        self.user_last_day = {}
+        self.last_days = pd.DatetimeIndex([])
+        self.users_by_last_day = {}
+
+    def append(self, df):
+        """
+        Adds a batch of payments to the store.
+
+        :param df: pandas.DataFrame, The new payments, with the columns given to the store
+        :return: MetricStore, The updated store
+        """
+
+        df = df[[self.user_id, self.revenue, self.plan_duration, self.date_column]].dropna(
+            subset=[self.user_id, self.date_column])
+        if df.empty:
+            return self
+
+        payment_dates = pd.to_datetime(df[self.date_column])
+        batch = pd.DataFrame({
+            'user': df[self.user_id].to_numpy(),
+            'revenue': df[self.revenue].to_numpy(dtype=np.float64, na_value=np.nan),
+            'payment_date': payment_dates.to_numpy(dtype='datetime64[ns]'),
+            'last_day': sb.last_day(df=df, date_column=self.date_column,
+                                    plan_duration=self.plan_duration).to_numpy(dtype='datetime64[ns]'),
+        })
+
+        self.total_revenue += batch['revenue'].sum()
+        self.users.update(batch['user'].unique())
+        self.longest_plan = max(self.longest_plan, int(sb.plan_duration_months(df[self.plan_duration]).max()))
+        batch_latest_payment = batch['payment_date'].max()
+        if self.latest_payment is None or batch_latest_payment > self.latest_payment:
+            self.latest_payment = batch_latest_payment
+
+        new_payment_dates = []
+        for payment_date, payments in batch.groupby('payment_date', sort=False):
+            if payment_date not in self.revenue_by_date:
+                new_payment_dates.append(payment_date)
+                self.revenue_by_date[payment_date] = 0.0
+                self.users_by_date[payment_date] = set()
+                self.intervals_by_date[payment_date] = []
+            self.revenue_by_date[payment_date] += payments['revenue'].sum()
+            self.users_by_date[payment_date].update(payments['user'].unique())
+            self.intervals_by_date[payment_date].append((payments['user'].to_numpy(), payments['last_day'].to_numpy()))
+        self.payment_dates = _merge_sorted(self.payment_dates, new_payment_dates)
+
+        new_last_days = []
+
+        for user, last_day in batch.groupby('user', sort=False)['last_day'].max().items():
+            previous_last_day = self.user_last_day.get(user)
+            if previous_last_day is not None:
+                if last_day <= previous_last_day:
+                    continue
+                self.users_by_last_day[previous_last_day] -= 1
+            self.user_last_day[user] = last_day
+            if last_day not in self.users_by_last_day:
+                new_last_days.append(last_day)
+                self.users_by_last_day[last_day] = 0
+            self.users_by_last_day[last_day] += 1
+        self.last_days = _merge_sorted(self.last_days, new_last_days)
+
+        return self
+
+    def _users_active_at(self, date):
+        earliest_payment = date - relativedelta(months=self.longest_plan + 1)
+        first = self.payment_dates.searchsorted(earliest_payment, side='left')
+        last = self.payment_dates.searchsorted(date, side='left')
+
+        active_users = set()
+        for payment_date in self.payment_dates[first:last]:
+            for users, last_days in self.intervals_by_date[payment_date]:
+                active_users.update(users[last_days >= date.to_datetime64()])
+
+        return active_users
+
+    def churn_rate(self, date_split=None, timespan='whole'):
+        """
+        Calculates the churn rate over the stored payments, as churn_rate_calculation does.
+
+        :param date_split: (optional) The date from which the churn is measured, required unless timespan is 'whole'
+        :param timespan: (optional) The timespan in format 'x days', 'x months', 'x years', or 'whole'.
+        The default is 'whole'.
+        :return: calculated churn rate.
+        """
+
+        if self.latest_payment is None:
+            raise ValueError("no payments in the store")
+
+        if timespan == 'whole':
+            total_customers = len(self.users)
+            latest_subscription = self.latest_payment - relativedelta(days=1)
+            first_active = self.last_days.searchsorted(latest_subscription, side='right')
+            not_churned_customers = sum(self.users_by_last_day[last_day] for last_day in self.last_days[first_active:])
+            churned_customers = total_customers - not_churned_customers
+            churn_rate = round((churned_customers / total_customers) * 100, 2)
+        else:
+            date_split = pd.Timestamp(date_split)
+            end_date = date_split + timespan_to_relativedelta(timespan)
+
+            start_users = self._users_active_at(date_split)
+            end_users = start_users & self._users_active_at(end_date)
+
+            customers_before = len(start_users)
+            churned_customers = customers_before - len(end_users)
+            if customers_before > 0:
+                churn_rate = round(((churned_customers / customers_before) * 100), 2)
+            else:
+                churn_rate = 0
+
+        return churn_rate
+
+    def arpu(self, date_split=None, timespan='whole'):
+        """
+        Calculates the ARPU over the stored payments, as arpu_calculation does.
+
+        :param date_split: (optional) The last day of the window, required unless timespan is 'whole'
+        :param timespan: (optional) The window length in format 'x days', 'x months', 'x years', or 'whole'.
+        The default is 'whole'.
+        :return: calculated ARPU.
+        """
+
+        if self.latest_payment is None:
+            raise ValueError("no payments in the store")
+
+        if timespan == 'whole':
+            return self.total_revenue / len(self.users)
+
+        date_split = pd.Timestamp(date_split)
+        start_date = date_split - timespan_to_relativedelta(timespan)
+        first = self.payment_dates.searchsorted(start_date, side='left')
+        last = self.payment_dates.searchsorted(date_split, side='right')
+
+        window_revenue = 0.0
+        window_users = set()
+        for payment_date in self.payment_dates[first:last]:
+            window_revenue += self.revenue_by_date[payment_date]
+            window_users.update(self.users_by_date[payment_date])
+
+        if window_users:
+            arpu = window_revenue / len(window_users)
+        else:
+            arpu = np.nan
+
+        return arpu
+
+    def ltv(self, date_split=None, timespan='whole'):
+        """
+        Calculates the LTV over the stored payments, as ltv_calculation does.
+
+        :param date_split: (optional) The split date, required unless timespan is 'whole'
+        :param timespan: (optional) The timespan in format 'x days', 'x months', 'x years', or 'whole'.
+        The default is 'whole'.
+        :return: calculated LTV.
+        """
+
+        churn_rate = self.churn_rate(date_split=date_split, timespan=timespan) * 0.01
+        arpu = self.arpu(date_split=date_split, timespan=timespan)
+
+        ltv = arpu / churn_rate
+
+        return ltv
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+import hashlib
+import math
+import numpy as np
+from scipy.stats import norm, shapiro, normaltest
+
+METHODS = {'shapiro': 'Shapiro-Wilk', 'dagostino': "D'Agostino-Pearson", 'anderson': 'Anderson-Darling'}
+
+_settings = {'maxsize': 256}
+_entries = OrderedDict()
+
+
+def clear_normality_cache():
+    """
+    Drops the cached normality test results.
+    """
+
+    _entries.clear()
+
+
+def _sample_fingerprint(sample):
+    return hashlib.blake2b(np.ascontiguousarray(sample).tobytes(), digest_size=16).hexdigest()
+
+
+def subsample(values, max_sample=5000, seed=0):
+    """
+    Draws a deterministic random subsample without replacement, so the same data always gives the same subsample.
+
+    :param values: numpy.ndarray, The values
+    :param max_sample: int, optional, The size of the subsample. Defaults to 5000.
+    :param seed: int, optional, The seed of the draw. Defaults to 0.
+    :return: numpy.ndarray, The values themselves when there are at most max_sample, else a subsample in data order
+    """
+
+    if len(values) <= max_sample:
+        return values
+    positions = np.random.default_rng(seed).choice(len(values), size=max_sample, replace=False)
+
+    return values[np.sort(positions)]
+
+
+def anderson_darling_p_value(values):
+    """
+    Calculates the p-value of the Anderson-Darling test of normality with estimated mean and variance, using the
+    D'Agostino-Stephens approximation of the distribution of the small-sample adjusted statistic.
+    H0: the values come from a normal distribution.
+
+    :param values: numpy.ndarray, The values
+    :return: float, The calculated p-value
+    """
+
+    n = len(values)
+    z_scores = np.sort((values - values.mean()) / values.std(ddof=1))
+    weights = 2 * np.arange(1, n + 1) - 1
+    a2 = -n - np.sum(weights * (norm.logcdf(z_scores) + norm.logsf(z_scores[::-1]))) / n
+    a2 *= 1 + 0.75 / n + 2.25 / n ** 2
+
+    if a2 >= 153.467:
+        # The approximation is a parabola with its minimum here, beyond it the p-value is 0 to machine precision.
+        p_value = 0.0
+    elif a2 >= 0.6:
+        p_value = math.exp(1.2937 - 5.709 * a2 + 0.0186 * a2 ** 2)
+    elif a2 >= 0.34:
+        p_value = math.exp(0.9177 - 4.279 * a2 - 1.38 * a2 ** 2)
+    elif a2 >= 0.2:
+        p_value = 1 - math.exp(-8.318 + 42.796 * a2 - 59.938 * a2 ** 2)
+    else:
+        p_value = 1 - math.exp(-13.436 + 101.14 * a2 - 223.73 * a2 ** 2)
+
+    return min(max(p_value, 0.0), 1.0)
+
+
+def normality_p_value(values, method='shapiro', max_sample=5000, seed=0):
+    """
+    Calculates the p-value of a normality test on at most max_sample values, so the cost does not grow with the
+    data. The p-value only depends on the drawn subsample, so results are cached by the fingerprint of the subsample:
+    re-testing the same column hashes at most max_sample values instead of the whole column, and runs no test.
+    H0: the values come from a normal distribution.
+
+    :param values: array-like, The values. Missing values are dropped from the subsample, so with missing data the
+    test runs on somewhat fewer than max_sample values.
+    :param method: str, optional, 'shapiro' (Shapiro-Wilk), 'dagostino' (D'Agostino-Pearson, faster) or
+    'anderson' (Anderson-Darling, faster). Defaults to 'shapiro'.
+    :param max_sample: int, optional, The size of the deterministic subsample for larger data. Defaults to 5000,
+    the size above which the Shapiro-Wilk p-value is unreliable.
+    :param seed: int, optional, The seed of the subsample. Defaults to 0.
+    :return: float, The calculated p-value, nan when there are too few values for the method
+    """
+
+    if method not in METHODS:
+        raise ValueError("method must be 'shapiro', 'dagostino', or 'anderson'")
+
+    # Only the subsample is converted and cleaned, so a cache hit does no work over the whole column
+    sample = np.asarray(subsample(np.asarray(values), max_sample=max_sample, seed=seed), dtype=np.float64)
+    sample = sample[~np.isnan(sample)]
+    key = (_sample_fingerprint(sample), len(sample), method)
+    if key in _entries:
+        _entries.move_to_end(key)
+        return _entries[key]
+
+    if len(sample) < (8 if method == 'dagostino' else 3):
+        p_value = np.nan
+    elif method == 'shapiro':
+        p_value = shapiro(sample)[1]
+    elif method == 'dagostino':
+        p_value = normaltest(sample)[1]
+    else:
+        p_value = anderson_darling_p_value(sample)
+
+    _entries[key] = p_value
+    while len(_entries) > _settings['maxsize']:
+        _entries.popitem(last=False)
+
+    return p_value
+
+
+def normality_p_value_for_df(df, column, method='shapiro', max_sample=5000, seed=0):
+    """
+    Calculates the p-value of a normality test of a dataframe column, see normality_p_value.
+    H0: the values of the column come from a normal distribution.
+
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param column: str, The column in the dataframe to test
+    :param method: str, optional, 'shapiro', 'dagostino' or 'anderson'. Defaults to 'shapiro'.
+    :param max_sample: int, optional, The size of the deterministic subsample for larger data. Defaults to 5000.
+    :param seed: int, optional, The seed of the subsample. Defaults to 0.
+    :return: float, The calculated p-value
+    """
+
+    return normality_p_value(df[column], method=method, max_sample=max_sample, seed=seed)
+
+
+def check_normality(values, label, method='shapiro', alpha=0.05):
+    """
+    Tests the normality assumption of a parametric test and reports when it is rejected.
+
+    :param values: array-like, The values assumed normal
+    :param label: str, The name of the values in the report
+    :param method: str, optional, 'shapiro', 'dagostino' or 'anderson'. Defaults to 'shapiro'.
+    :param alpha: float, optional, The significance level. Defaults to 0.05.
+    :return: float, The p-value of the normality test
+    """
+
+    p_value = normality_p_value(values, method=method)
+    if p_value <= alpha:
+        print(f"Data not normally distributed ({label}). {METHODS[method]} test p-value is {p_value}")
+
+    return p_value
@@ -0,0 +1,243 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+STATISTICS = ('difference_in_means', 'ratio', 'proportion')
+
+
+def _prepare_samples(sample1, sample2, statistic):
+    if statistic not in STATISTICS:
+        raise ValueError("statistic must be 'difference_in_means', 'ratio', or 'proportion'")
+
+    sample1 = np.asarray(sample1, dtype=np.float64)
+    sample2 = np.asarray(sample2, dtype=np.float64)
+    sample1 = sample1[~np.isnan(sample1)]
+    sample2 = sample2[~np.isnan(sample2)]
+
+    if statistic == 'proportion':
+        for sample in (sample1, sample2):
+            if not np.isin(sample, (0, 1)).all():
+                raise ValueError("proportion samples must only contain 0/1 or boolean values")
+
+    return sample1, sample2
+
+
+def _statistic(mean1, mean2, statistic):
+    """
+    The statistic of two samples from their means: mean1 - mean2 for 'difference_in_means' and 'proportion',
+    mean1 / mean2 for 'ratio'.
+    """
+
+    if statistic == 'ratio':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return mean1 / mean2
+    return mean1 - mean2
+
+
+def _batch_size(bytes_per_resample, max_batch_bytes):
+    return max(1, int(max_batch_bytes // bytes_per_resample))
+
+
+def _bootstrap_worker(sample1, sample2, statistic, n_resamples, seed_sequence, max_batch_bytes):
+    """
+    Draws n_resamples bootstrap statistics, a batch of resamples at a time: each batch is a 2-D array of indices, one
+    row per resample, drawn with replacement within each sample.
+    """
+
+    rng = np.random.default_rng(seed_sequence)
+    n1, n2 = len(sample1), len(sample2)
+    index_dtype = np.int32 if max(n1, n2) < np.iinfo(np.int32).max else np.int64
+    bytes_per_resample = (n1 + n2) * (np.dtype(index_dtype).itemsize + sample1.itemsize)
+    batch_size = _batch_size(bytes_per_resample, max_batch_bytes)
+
+    statistics = np.empty(n_resamples, dtype=np.float64)
+    for start in range(0, n_resamples, batch_size):
+        size = min(batch_size, n_resamples - start)
+        means1 = sample1[rng.integers(0, n1, size=(size, n1), dtype=index_dtype)].mean(axis=1)
+        means2 = sample2[rng.integers(0, n2, size=(size, n2), dtype=index_dtype)].mean(axis=1)
+        statistics[start:start + size] = _statistic(means1, means2, statistic)
+
+    return statistics
+
+
+def _permutation_worker(sample1, sample2, statistic, n_resamples, seed_sequence, max_batch_bytes):
+    """
+    Draws n_resamples statistics under random relabelling of the pooled observations. Each batch shuffles a 2-D
+    array of pooled indices row by row. Only the smaller group is gathered: the sum of the other group is the pooled
+    total minus its sum.
+    """
+
+    rng = np.random.default_rng(seed_sequence)
+    pooled = np.concatenate([sample1, sample2])
+    n1, n2 = len(sample1), len(sample2)
+    n = n1 + n2
+    m = min(n1, n2)
+    pooled_sum = pooled.sum()
+    index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    bytes_per_resample = n * np.dtype(index_dtype).itemsize + m * pooled.itemsize
+    batch_size = _batch_size(bytes_per_resample, max_batch_bytes)
+
+    statistics = np.empty(n_resamples, dtype=np.float64)
+    for start in range(0, n_resamples, batch_size):
+        size = min(batch_size, n_resamples - start)
+        indices = np.tile(np.arange(n, dtype=index_dtype), (size, 1))
+        rng.permuted(indices, axis=1, out=indices)
+        smaller_sums = pooled[indices[:, :m]].sum(axis=1)
+        if n1 == m:
+            sums1, sums2 = smaller_sums, pooled_sum - smaller_sums
+        else:
+            sums1, sums2 = pooled_sum - smaller_sums, smaller_sums
+        statistics[start:start + size] = _statistic(sums1 / n1, sums2 / n2, statistic)
+
+    return statistics
+
+
+def _resample(worker, sample1, sample2, statistic, n_resamples, seed, n_workers, max_batch_bytes):
+    """
+    Splits n_resamples between n_workers processes. Every worker gets its own random stream spawned from seed, so the
+    result is reproducible for a given seed and n_workers.
+    """
+
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_workers)
+    shares = [len(share) for share in np.array_split(np.arange(n_resamples), n_workers)]
+
+    if n_workers == 1:
+        return worker(sample1, sample2, statistic, shares[0], seed_sequences[0], max_batch_bytes)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(worker, sample1, sample2, statistic, share, seed_sequence, max_batch_bytes)
+                   for share, seed_sequence in zip(shares, seed_sequences)]
+        return np.concatenate([future.result() for future in futures])
+
+
+def bootstrap(sample1, sample2, statistic='difference_in_means', n_resamples=10000, confidence_level=0.95,
+              seed=None, n_workers=1, max_batch_bytes=256 * 2 ** 20):
+    """
+    Estimates the sampling distribution of a two-sample statistic by resampling each sample with replacement.
+
+    :param sample1: array-like, The first sample. Missing values are dropped.
+    :param sample2: array-like, The second sample. Missing values are dropped.
+    :param statistic: str, optional, 'difference_in_means' (mean1 - mean2), 'ratio' (mean1 / mean2) or 'proportion'
+    (proportion1 - proportion2 of 0/1 samples). Defaults to 'difference_in_means'.
+    :param n_resamples: int, optional, The number of bootstrap resamples. Defaults to 10000.
+    :param confidence_level: float, optional, The confidence level of the percentile interval. Defaults to 0.95.
+    :param seed: int, optional, The seed of the random streams of the workers
+    :param n_workers: int, optional, The number of processes sharing the resamples. Defaults to 1.
+    :param max_batch_bytes: int, optional, The memory bound of one batch of resample indices and gathered values.
+    Defaults to 256 MiB.
+    :return: dict, The observed 'statistic', its bootstrap 'standard_error', and the percentile confidence interval
+    'low' and 'high'
+    """
+
+    sample1, sample2 = _prepare_samples(sample1, sample2, statistic)
+    observed = _statistic(sample1.mean(), sample2.mean(), statistic)
+
+    statistics = _resample(_bootstrap_worker, sample1, sample2, statistic, n_resamples, seed, n_workers,
+                           max_batch_bytes)
+    alpha = 1 - confidence_level
+    low, high = np.nanquantile(statistics, [alpha / 2, 1 - alpha / 2])
+
+    return {'statistic': observed, 'standard_error': np.nanstd(statistics, ddof=1), 'low': low, 'high': high}
+
+
+def permutation_test(sample1, sample2, statistic='difference_in_means', n_resamples=10000, tail='two', seed=None,
+                     n_workers=1, max_batch_bytes=256 * 2 ** 20):
+    """
+    Calculates the p-value of a two-sample permutation test.
+    H0: both samples come from the same distribution, so the group labels are exchangeable.
+
+    :param sample1: array-like, The first sample. Missing values are dropped.
+    :param sample2: array-like, The second sample. Missing values are dropped.
+    :param statistic: str, optional, 'difference_in_means' (mean1 - mean2), 'ratio' (mean1 / mean2) or 'proportion'
+    (proportion1 - proportion2 of 0/1 samples). Defaults to 'difference_in_means'.
+    :param n_resamples: int, optional, The number of random permutations. Defaults to 10000.
+    :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param seed: int, optional, The seed of the random streams of the workers
+    :param n_workers: int, optional, The number of processes sharing the permutations. Defaults to 1.
+    :param max_batch_bytes: int, optional, The memory bound of one batch of permutation indices and gathered values.
+    Defaults to 256 MiB.
+    :return: float, The calculated p-value
+    """
+
+    if tail not in ('right', 'left', 'two'):
+        raise ValueError("tail must be 'right', 'left', or 'two'")
+
+    sample1, sample2 = _prepare_samples(sample1, sample2, statistic)
+    observed = _statistic(sample1.mean(), sample2.mean(), statistic)
+
+    statistics = _resample(_permutation_worker, sample1, sample2, statistic, n_resamples, seed, n_workers,
+                           max_batch_bytes)
+    p_value_right = (np.sum(statistics >= observed) + 1) / (n_resamples + 1)
+    p_value_left = (np.sum(statistics <= observed) + 1) / (n_resamples + 1)
+
+    if tail == 'right':
+        p_value = p_value_right
+    elif tail == 'left':
+        p_value = p_value_left
+    else:
+        p_value = min(1.0, 2 * min(p_value_right, p_value_left))
+
+    return p_value
+
+
+def _samples_from_df(df, category_column, group1, group2, numerical_column, value):
+    samples = []
+    for group in (group1, group2):
+        column = df.loc[df[category_column] == group, numerical_column]
+        samples.append(column == value if value is not None else column)
+    return samples
+
+
+def bootstrap_for_df(df, category_column, group1, group2, numerical_column, statistic='difference_in_means',
+                     value=None, n_resamples=10000, confidence_level=0.95, seed=None, n_workers=1,
+                     max_batch_bytes=256 * 2 ** 20):
+    """
+    Estimates the sampling distribution of a statistic comparing two groups of a dataframe by bootstrap.
+
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param category_column: str, The column in the dataframe to group by
+    :param group1: str, The first group to compare
+    :param group2: str, The second group to compare
+    :param numerical_column: str, The column in the dataframe to perform the test on
+    :param statistic: str, optional, 'difference_in_means', 'ratio' or 'proportion', see bootstrap
+    :param value: optional, For proportions of a categorical column, the value whose proportion is compared
+    :param n_resamples: int, optional, The number of bootstrap resamples. Defaults to 10000.
+    :param confidence_level: float, optional, The confidence level of the percentile interval. Defaults to 0.95.
+    :param seed: int, optional, The seed of the random streams of the workers
+    :param n_workers: int, optional, The number of processes sharing the resamples. Defaults to 1.
+    :param max_batch_bytes: int, optional, The memory bound of one batch. Defaults to 256 MiB.
+    :return: dict, see bootstrap
+    """
+
+    sample1, sample2 = _samples_from_df(df, category_column, group1, group2, numerical_column, value)
+
+    return bootstrap(sample1=sample1, sample2=sample2, statistic=statistic, n_resamples=n_resamples,
+                     confidence_level=confidence_level, seed=seed, n_workers=n_workers,
+                     max_batch_bytes=max_batch_bytes)
+
+
+def permutation_test_for_df(df, category_column, group1, group2, numerical_column, statistic='difference_in_means',
+                            value=None, n_resamples=10000, tail='two', seed=None, n_workers=1,
+                            max_batch_bytes=256 * 2 ** 20):
+    """
+    Calculates the p-value of a permutation test comparing two groups of a dataframe.
+    H0: both groups come from the same distribution.
+
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param category_column: str, The column in the dataframe to group by
+    :param group1: str, The first group to compare
+    :param group2: str, The second group to compare
+    :param numerical_column: str, The column in the dataframe to perform the test on
+    :param statistic: str, optional, 'difference_in_means', 'ratio' or 'proportion', see permutation_test
+    :param value: optional, For proportions of a categorical column, the value whose proportion is compared
+    :param n_resamples: int, optional, The number of random permutations. Defaults to 10000.
+    :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param seed: int, optional, The seed of the random streams of the workers
+    :param n_workers: int, optional, The number of processes sharing the permutations. Defaults to 1.
+    :param max_batch_bytes: int, optional, The memory bound of one batch. Defaults to 256 MiB.
+    :return: float, The calculated p-value
+    """
+
+    sample1, sample2 = _samples_from_df(df, category_column, group1, group2, numerical_column, value)
+
+    return permutation_test(sample1=sample1, sample2=sample2, statistic=statistic, n_resamples=n_resamples,
+                            tail=tail, seed=seed, n_workers=n_workers, max_batch_bytes=max_batch_bytes)
@@ -1,40 +1,74 @@
 # TODO: Correct funcitons docs
 from dateutil.relativedelta import relativedelta
+import numpy as np
 import pandas as pd
+from . import cache
+from . import subscriptions as sb
 
 
 def churn_rate_one_period(df, date_column, user_id):
-    total_customers = df[user_id].nunique()
-    latest_subscription = df[date_column].max() - relativedelta(days=1)
+    if isinstance(df, sb.SubscriptionFrame):
+        has_user = df.user_codes >= 0
+        total_customers = len(np.unique(df.user_codes[has_user]))
+        latest_subscription = df.payment_dates[~np.isnat(df.payment_dates)].max() - np.timedelta64(1, 'D')
 
-    not_churned_customers = df[df['Last Day'] > latest_subscription][user_id].nunique()
+        not_churned_customers = len(np.unique(df.user_codes[has_user & (df.last_days > latest_subscription)]))
+    else:
+        total_customers = df[user_id].nunique()
+        latest_subscription = df[date_column].max() - relativedelta(days=1)
+
+        not_churned_customers = df[df['Last Day'] > latest_subscription][user_id].nunique()
     churned_customers = total_customers - not_churned_customers
 
     churn_rate = round((churned_customers / total_customers) * 100, 2)
     return churn_rate
 
 
-def churn_rate_two_periods(df, date_column, user_id, date_split, timespan):
+def timespan_to_relativedelta(timespan):
+    """
+    Converts a timespan in format 'x days', 'x months' or 'x years' into a relativedelta.
+
+    :param timespan: str, The timespan to convert
+    :return: relativedelta, The timespan as an offset that can be added to dates
+    """
 
     split_timespan = timespan.split(" ")
 
     if "months" in split_timespan:
         number_of_months = int(split_timespan[0])
-        end_date = date_split + relativedelta(months=number_of_months)
+        offset = relativedelta(months=number_of_months)
     elif "days" in split_timespan:
         number_of_days = int(split_timespan[0])
-        end_date = date_split + relativedelta(days=number_of_days)
+        offset = relativedelta(days=number_of_days)
     elif "years" in split_timespan:
         number_of_years = int(split_timespan[0])
-        end_date = date_split + relativedelta(years=number_of_years)
+        offset = relativedelta(years=number_of_years)
     else:
         raise ValueError("Invalid timespan.")
 
-    df1 = df[(df[date_column] < date_split) & (df["Last Day"] >= date_split)]
-    start_users = df1[user_id].unique()
+    return offset
+
+
+def churn_rate_two_periods(df, date_column, user_id, date_split, timespan, index=None):
+
+    end_date = date_split + timespan_to_relativedelta(timespan)
+
+    if index is not None:
+        start_users = index.active_users(date_split)
+        end_users = np.intersect1d(start_users, index.active_users(end_date))
+    elif isinstance(df, sb.SubscriptionFrame):
+        split = pd.Timestamp(date_split).to_datetime64()
+        end = pd.Timestamp(end_date).to_datetime64()
+        has_user = df.user_codes >= 0
+        start_users = np.unique(df.user_codes[has_user & (df.payment_dates < split) & (df.last_days >= split)])
+        end_users = np.intersect1d(start_users,
+                                   df.user_codes[has_user & (df.payment_dates < end) & (df.last_days >= end)])
+    else:
+        df1 = df[(df[date_column] < date_split) & (df["Last Day"] >= date_split)]
+        start_users = df1[user_id].unique()
 
-    df3 = df[df[user_id].isin(start_users) & (df[date_column] < end_date) & (df["Last Day"] >= end_date)]
-    end_users = df3[user_id].unique()
+        df3 = df[df[user_id].isin(start_users) & (df[date_column] < end_date) & (df["Last Day"] >= end_date)]
+        end_users = df3[user_id].unique()
 
     customers_before = len(start_users)
     not_churned_customers = len(end_users)
@@ -49,13 +83,15 @@ def churn_rate_two_periods(df, date_column, user_id, date_split, timespan):
     return churn_rate
 
 
-def churn_rate_calculation(df, user_id, plan_duration, date_column, date_split=None, timespan='whole'):
+@cache.memoize('user_id', 'plan_duration', 'date_column')
+def churn_rate_calculation(df, user_id, plan_duration, date_column, date_split=None, timespan='whole', index=None):
     """
     This function calculates the churn rate for a given DataFrame of subscription data.
     The churn rate is the percentage of subscribers who stop their subscriptions within a certain time period.
+    A DataFrame is read into a SubscriptionFrame first, so no columns are added to it.
 
     :param date_split:
-    :param df: The input DataFrame containing the subscription data.
+    :param df: The input DataFrame or SubscriptionFrame containing the subscription data.
     :param user_id: The column name in the DataFrame that represents unique user identifiers.
     :param date_column: The column name in the DataFrame that represents the payment dates.
     :param plan_duration: The column name in the DatFrame that represents the plan duration in format 'x months'.
@@ -63,12 +99,17 @@ def churn_rate_calculation(df, user_id, plan_duration, date_column, date_split=N
     If not provided, the function will use the entire DataFrame.
     :param timespan: (optional) The timespan for which to calculate the churn rate.
     It should be in the format of [YYYY-MM-DD, YYYY-MM-DD, YYYY-MM-DD], or ‘whole’ for the entire DataFrame. The default is ‘whole’.
+    :param index: (optional) An ActiveSubscriberIndex built over the same DataFrame, used to find the active users
+    at the split and end dates when a timespan is given.
     :return: calculated churn rate.
     """
 
-    df.loc[:, 'Duration'] = df.loc[:, plan_duration].apply(lambda x: int(x.split(" ")[0]))
-    df.loc[:, 'Last Day'] = df.apply(lambda row: row[date_column] + relativedelta(months=int(row['Duration'])), axis=1)
-    df.loc[:, 'Last Day'] = pd.to_datetime(df['Last Day'])
+    if timespan != "whole" and index is not None:
+        return churn_rate_two_periods(df=df, date_column=date_column, user_id=user_id, date_split=date_split,
+                                      timespan=timespan, index=index)
+
+    if not isinstance(df, sb.SubscriptionFrame):
+        df = sb.SubscriptionFrame.from_df(df=df, user_id=user_id, date_column=date_column, plan_duration=plan_duration)
 
     if timespan == "whole":
         churn_rate = churn_rate_one_period(df=df, date_column=date_column, user_id=user_id)
@@ -79,13 +120,117 @@ def churn_rate_calculation(df, user_id, plan_duration, date_column, date_split=N
     return churn_rate
 
 
+def _apply_activity_events(state, other_state, users, steps):
+    touched_users = np.unique(users)
+    was_active = state[touched_users] > 0
+    was_active_in_both = was_active & (other_state[touched_users] > 0)
+
+    np.add.at(state, users, steps)
+
+    is_active = state[touched_users] > 0
+    is_active_in_both = is_active & (other_state[touched_users] > 0)
+
+    active_change = int(is_active.sum()) - int(was_active.sum())
+    both_change = int(is_active_in_both.sum()) - int(was_active_in_both.sum())
+
+    return active_change, both_change
+
+
+def churn_rate_series(df, user_id, plan_duration, date_column, freq='M', timespan='1 months', date_splits=None):
+    """
+    This function calculates the churn rate for every split date in a single sweep over the subscription data.
+    For every date it gives the same value as churn_rate_calculation(..., date_split=date, timespan=timespan).
+
+    Every payment opens a subscription interval (Payment Date, Last Day]. The intervals are turned into sorted
+    activation and deactivation events once, and two cursors sweep them: one over the split dates and one over the
+    split dates shifted by the timespan. Per-user active interval counts are kept for both cursors, so the number of
+    users active at the split date and the number of them still active at the end date are updated from the events
+    between two consecutive dates only.
+
+    :param df: The input DataFrame or SubscriptionFrame containing the subscription data.
+    :param user_id: The column name in the DataFrame that represents unique user identifiers.
+    :param plan_duration: The column name in the DatFrame that represents the plan duration in format 'x months'.
+    :param date_column: The column name in the DataFrame that represents the payment dates.
+    :param freq: (optional) The pandas period frequency used to build split dates from the payment dates.
+    The default is 'M', the first day of every month with payments.
+    :param timespan: (optional) The timespan after each split date in format 'x days', 'x months' or 'x years'.
+    The default is '1 months'.
+    :param date_splits: (optional) The split dates to use instead of the ones built from freq.
+    :return: DataFrame with columns 'Date' and 'Churn', sorted by date.
+    """
+
+    offset = timespan_to_relativedelta(timespan)
+    if not isinstance(df, sb.SubscriptionFrame):
+        df = sb.SubscriptionFrame.from_df(df=df, user_id=user_id, date_column=date_column, plan_duration=plan_duration)
+
+    if date_splits is None:
+        date_splits = pd.Series(df.payment_dates).dt.to_period(freq).dt.to_timestamp().dropna().unique()
+    date_splits = pd.DatetimeIndex(date_splits).sort_values()
+    end_dates = pd.DatetimeIndex([date_split + offset for date_split in date_splits])
+
+    user_codes = df.user_codes
+    user_labels = df.user_labels
+    starts = df.payment_dates
+    ends = df.last_days
+    valid = (user_codes >= 0) & ~np.isnat(starts) & ~np.isnat(ends)
+
+    event_times = np.concatenate([starts[valid], ends[valid]])
+    event_users = np.concatenate([user_codes[valid], user_codes[valid]])
+    event_steps = np.concatenate([np.ones(valid.sum(), dtype=np.int64), -np.ones(valid.sum(), dtype=np.int64)])
+
+    order = np.argsort(event_times, kind='stable')
+    event_times = event_times[order]
+    event_users = event_users[order]
+    event_steps = event_steps[order]
+
+    active_at_split = np.zeros(len(user_labels), dtype=np.int64)
+    active_at_end = np.zeros(len(user_labels), dtype=np.int64)
+    split_cursor = 0
+    end_cursor = 0
+    customers_before = 0
+    not_churned_customers = 0
+
+    churn_rates = []
+    for date_split, end_date in zip(date_splits.to_numpy(dtype='datetime64[ns]'),
+                                    end_dates.to_numpy(dtype='datetime64[ns]')):
+
+        next_split_cursor = np.searchsorted(event_times, date_split, side='left')
+        if next_split_cursor > split_cursor:
+            active_change, both_change = _apply_activity_events(
+                state=active_at_split, other_state=active_at_end,
+                users=event_users[split_cursor:next_split_cursor], steps=event_steps[split_cursor:next_split_cursor])
+            customers_before += active_change
+            not_churned_customers += both_change
+            split_cursor = next_split_cursor
+
+        next_end_cursor = np.searchsorted(event_times, end_date, side='left')
+        if next_end_cursor > end_cursor:
+            active_change, both_change = _apply_activity_events(
+                state=active_at_end, other_state=active_at_split,
+                users=event_users[end_cursor:next_end_cursor], steps=event_steps[end_cursor:next_end_cursor])
+            not_churned_customers += both_change
+            end_cursor = next_end_cursor
+
+        churned_customers = customers_before - not_churned_customers
+        if customers_before > 0:
+            churn_rate = round(((churned_customers / customers_before) * 100), 2)
+        else:
+            churn_rate = 0
+        churn_rates.append(churn_rate)
+
+    churn_rate_df = pd.DataFrame({'Date': date_splits, 'Churn': churn_rates})
+
+    return churn_rate_df
+
+
+@cache.memoize('revenue', 'user_id', 'date_column')
 def arpu_calculation(df, revenue, user_id, date_split=None, date_column=None, timespan='whole'):
     """
     This function calculates the Average Revenue Per User for a given DataFrame of subscription data.
     ARPU is defined as the total revenue divided by the number of subscribers.
 
     :param date_split:
-    :param df: The input DataFrame containing the subscription data.
+    :param df: The input DataFrame or SubscriptionFrame containing the subscription data.
     :param revenue: The column name in the DataFrame that represents the revenue.
     :param user_id: The column name in the DataFrame that represents unique user identifiers.
     :param date_column: (optional) The column name in the DataFrame that represents the date.
@@ -95,6 +240,16 @@ def arpu_calculation(df, revenue, user_id, date_split=None, date_column=None, ti
     :return: calculated ARPU.
     """
 
+    if isinstance(df, sb.SubscriptionFrame):
+        in_window = np.ones(len(df), dtype=bool)
+        if date_column and timespan != "whole":
+            start_date = pd.Timestamp(date_split - timespan_to_relativedelta(timespan)).to_datetime64()
+            end_date = pd.Timestamp(date_split).to_datetime64()
+            in_window = (df.payment_dates >= start_date) & (df.payment_dates <= end_date)
+        arpu = np.nansum(df.revenue[in_window]) / len(np.unique(df.user_codes[in_window]))
+
+        return arpu
+
     split_timespan = timespan.split(" ")
 
     if date_column:
@@ -122,6 +277,91 @@ def arpu_calculation(df, revenue, user_id, date_split=None, date_column=None, ti
     return arpu
 
 
+def _update_user_counts(counts, users, step):
+    touched_users = np.unique(users)
+    was_present = int((counts[touched_users] > 0).sum())
+    np.add.at(counts, users, step)
+    is_present = int((counts[touched_users] > 0).sum())
+
+    return is_present - was_present
+
+
+def arpu_series(df, revenue, user_id, date_column, freq='M', timespan='1 months', date_splits=None):
+    """
+    This function calculates the ARPU over a sliding window ending at every split date.
+    For every date it gives the same value as arpu_calculation(..., date_split=date, timespan=timespan), up to the
+    floating-point rounding of the running revenue sum.
+
+    Payments are sorted by date once and the window bounds [date_split - timespan, date_split] are found with
+    searchsorted. As the window slides forward, the revenue sum and the per-user payment counts are updated only
+    with the payments entering and leaving the window, so the number of distinct users is kept without rescanning.
+
+    :param df: The input DataFrame or SubscriptionFrame containing the subscription data.
+    :param revenue: The column name in the DataFrame that represents the revenue.
+    :param user_id: The column name in the DataFrame that represents unique user identifiers.
+    :param date_column: The column name in the DataFrame that represents the payment dates.
+    :param freq: (optional) The pandas period frequency used to build split dates from the payment dates.
+    The default is 'M', the first day of every month with payments.
+    :param timespan: (optional) The window length in format 'x days', 'x months' or 'x years'. The default is '1 months'.
+    :param date_splits: (optional) The split dates to use instead of the ones built from freq.
+    :return: DataFrame with columns 'Date' and 'ARPU', sorted by date. ARPU is NaN for windows without payments.
+    """
+
+    offset = timespan_to_relativedelta(timespan)
+    if not isinstance(df, sb.SubscriptionFrame):
+        df = sb.SubscriptionFrame.from_df(df=df, user_id=user_id, date_column=date_column, revenue=revenue)
+
+    if date_splits is None:
+        date_splits = pd.Series(df.payment_dates).dt.to_period(freq).dt.to_timestamp().dropna().unique()
+    date_splits = pd.DatetimeIndex(date_splits).sort_values()
+    start_dates = pd.DatetimeIndex([date_split - offset for date_split in date_splits])
+
+    # Missing users share code 0, as unique() counts them as one user in arpu_calculation
+    user_codes = df.user_codes + 1
+    user_labels = np.arange(len(df.user_labels) + 1)
+    dates = df.payment_dates
+    revenues = df.revenue
+    valid = ~np.isnat(dates)
+
+    order = np.argsort(dates[valid], kind='stable')
+    dates = dates[valid][order]
+    user_codes = user_codes[valid][order]
+    revenues = np.nan_to_num(revenues[valid][order].astype(np.float64), nan=0.0)
+
+    lower_bounds = np.searchsorted(dates, start_dates.to_numpy(dtype='datetime64[ns]'), side='left')
+    upper_bounds = np.searchsorted(dates, date_splits.to_numpy(dtype='datetime64[ns]'), side='right')
+
+    payments_per_user = np.zeros(len(user_labels), dtype=np.int64)
+    window_revenue = 0.0
+    window_users = 0
+    lower_cursor = 0
+    upper_cursor = 0
+
+    arpus = []
+    for lower_bound, upper_bound in zip(lower_bounds, upper_bounds):
+
+        if upper_bound > upper_cursor:
+            window_revenue += revenues[upper_cursor:upper_bound].sum()
+            window_users += _update_user_counts(payments_per_user, user_codes[upper_cursor:upper_bound], 1)
+            upper_cursor = upper_bound
+
+        if lower_bound > lower_cursor:
+            window_revenue -= revenues[lower_cursor:lower_bound].sum()
+            window_users += _update_user_counts(payments_per_user, user_codes[lower_cursor:lower_bound], -1)
+            lower_cursor = lower_bound
+
+        if window_users > 0:
+            arpu = window_revenue / window_users
+        else:
+            arpu = np.nan
+        arpus.append(arpu)
+
+    arpu_df = pd.DataFrame({'Date': date_splits, 'ARPU': arpus})
+
+    return arpu_df
+
+
+@cache.memoize('revenue', 'plan_duration', 'user_id', 'date_column')
 def ltv_calculation(df, revenue, plan_duration, user_id, date_column, timespan='whole', date_split=None):
     """
     This function calculates the Lifetime Value (LTV) for a given DataFrame of subscription data.
@@ -129,7 +369,7 @@ def ltv_calculation(df, revenue, plan_duration, user_id, date_column, timespan='
 
     :param date_split:
     :param plan_duration:
-    :param df: The input DataFrame containing the subscription data.
+    :param df: The input DataFrame or SubscriptionFrame containing the subscription data.
     :param revenue: The column name in the DataFrame that represents the revenue.
     :param user_id: The column name in the DataFrame that represents unique user identifiers.
     :param date_column: (optional) The column name in the DataFrame that represents the date.
@@ -147,3 +387,175 @@ def ltv_calculation(df, revenue, plan_duration, user_id, date_column, timespan='
     ltv = arpu / churn_rate
 
     return ltv
+
+
+def cohort_matrix(df, revenue, user_id, plan_duration, date_column, join_column='Join Date'):
+    """
+    This function builds cohort x months-since-join matrices of retention, cumulative revenue and LTV.
+    A user's cohort is the month of their earliest join date. Subscription periods follow churn_rate_calculation:
+    a payment keeps its user active from the payment date up to its 'Last Day', so the user counts as retained in
+    every month from the payment month to the month of the last day. Revenue is booked in the payment month.
+
+    All matrices are filled in one vectorized pass: months are turned into integer codes, every payment is expanded
+    into the month periods it covers, (user, period) pairs are deduplicated and counted per (cohort, period) cell
+    with bincount.
+
+    :param df: The input DataFrame containing the subscription data.
+    :param revenue: The column name in the DataFrame that represents the revenue.
+    :param user_id: The column name in the DataFrame that represents unique user identifiers.
+    :param plan_duration: The column name in the DatFrame that represents the plan duration in format 'x months'.
+    :param date_column: The column name in the DataFrame that represents the payment dates.
+    :param join_column: (optional) The column name in the DataFrame that represents the join dates.
+    The default is 'Join Date'.
+    :return: dict with 'cohort_size' (Series), and 'retention' (% of the cohort active), 'cumulative_revenue' and
+    'ltv' (cumulative revenue per cohort user) DataFrames indexed by cohort month with months since join as columns.
+    """
+
+    user_codes, user_labels = pd.factorize(df[user_id])
+    join_months = pd.to_datetime(df[join_column]).to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    payment_months = pd.to_datetime(df[date_column]).to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    last_day_months = sb.last_day(df=df, date_column=date_column,
+                                  plan_duration=plan_duration).to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    revenues = np.nan_to_num(df[revenue].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+
+    has_join = (user_codes >= 0) & ~np.isnat(join_months)
+    no_cohort = np.iinfo(np.int64).max
+    user_cohort_months = np.full(len(user_labels), no_cohort, dtype=np.int64)
+    np.minimum.at(user_cohort_months, user_codes[has_join], join_months[has_join].astype(np.int64))
+
+    cohort_months, user_cohort_codes = np.unique(user_cohort_months, return_inverse=True)
+    has_cohort = cohort_months != no_cohort
+    cohort_months = cohort_months[has_cohort]
+    n_cohorts = len(cohort_months)
+    cohort_sizes = np.bincount(user_cohort_codes[user_cohort_months != no_cohort], minlength=n_cohorts)
+
+    valid = ((user_codes >= 0) & ~np.isnat(payment_months) & ~np.isnat(last_day_months))
+    valid[valid] = user_cohort_months[user_codes[valid]] != no_cohort
+    row_users = user_codes[valid]
+    row_cohorts = user_cohort_codes[row_users]
+    first_periods = payment_months[valid].astype(np.int64) - user_cohort_months[row_users]
+    last_periods = last_day_months[valid].astype(np.int64) - user_cohort_months[row_users]
+    row_revenues = revenues[valid]
+
+    n_periods = int(max(last_periods.max(initial=-1), first_periods.max(initial=-1))) + 1
+    n_periods = max(n_periods, 1)
+
+    covered_months = np.maximum(last_periods - first_periods + 1, 0)
+    expanded_rows = np.repeat(np.arange(len(row_users)), covered_months)
+    expanded_offsets = np.arange(len(expanded_rows)) - np.repeat(np.cumsum(covered_months) - covered_months,
+                                                                 covered_months)
+    expanded_periods = first_periods[expanded_rows] + expanded_offsets
+    in_matrix = expanded_periods >= 0
+    active_pairs = np.unique(row_users[expanded_rows][in_matrix] * n_periods + expanded_periods[in_matrix])
+    active_users = np.bincount(user_cohort_codes[active_pairs // n_periods] * n_periods + active_pairs % n_periods,
+                               minlength=n_cohorts * n_periods).reshape(n_cohorts, n_periods)
+
+    paid = first_periods >= 0
+    period_revenue = np.bincount(row_cohorts[paid] * n_periods + first_periods[paid], weights=row_revenues[paid],
+                                 minlength=n_cohorts * n_periods).reshape(n_cohorts, n_periods)
+    cumulative_revenue = np.cumsum(period_revenue, axis=1)
+
+    cohorts = pd.DatetimeIndex(cohort_months.astype('datetime64[M]').astype('datetime64[ns]'), name='Cohort')
+    periods = pd.RangeIndex(n_periods, name='Months Since Join')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = active_users / cohort_sizes[:, None] * 100
+        ltv = cumulative_revenue / cohort_sizes[:, None]
+
+    cohort_matrices = {
+        'cohort_size': pd.Series(cohort_sizes, index=cohorts, name='Cohort Size'),
+        'retention': pd.DataFrame(retention, index=cohorts, columns=periods),
+        'cumulative_revenue': pd.DataFrame(cumulative_revenue, index=cohorts, columns=periods),
+        'ltv': pd.DataFrame(ltv, index=cohorts, columns=periods),
+    }
+
+    return cohort_matrices
+
+
+def _segment_metric_rows(segment, labels, codes, user_codes, n_users, revenues, payment_dates, last_days):
+    n_segments = len(labels)
+    valid = codes >= 0
+    codes = codes[valid]
+    user_codes = user_codes[valid]
+
+    segment_revenue = np.bincount(codes, weights=revenues[valid], minlength=n_segments)
+    segment_users = np.bincount(np.unique(codes * n_users + user_codes) // n_users, minlength=n_segments)
+
+    latest_payment = np.full(n_segments, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(latest_payment, codes, payment_dates[valid])
+    latest_subscription = latest_payment - np.timedelta64(1, 'D').astype('timedelta64[ns]').astype(np.int64)
+    row_last_days = last_days[valid]
+    active = (row_last_days != np.iinfo(np.int64).min) & (row_last_days > latest_subscription[codes])
+    not_churned_users = np.bincount(np.unique(codes[active] * n_users + user_codes[active]) // n_users,
+                                    minlength=n_segments)
+
+    rows = []
+    for code, label in enumerate(labels):
+        total_customers = int(segment_users[code])
+        if total_customers == 0:
+            continue
+        churned_customers = total_customers - int(not_churned_users[code])
+        churn_rate = round((churned_customers / total_customers) * 100, 2)
+        arpu = segment_revenue[code] / total_customers
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ltv = np.float64(arpu) / (churn_rate * 0.01)
+        rows.append({'Segment': segment, 'Value': label, 'Users': total_customers, 'ARPU': arpu,
+                     'Churn Rate': churn_rate, 'LTV': ltv})
+
+    return rows
+
+
+def segment_metrics(df, segments, revenue, user_id, plan_duration, date_column, cross=None):
+    """
+    This function calculates ARPU, churn rate and LTV for every value of every segment column.
+    Each value gives the same numbers as calling arpu_calculation, churn_rate_calculation and ltv_calculation with
+    timespan='whole' on the rows of that value.
+
+    Users, dates, 'Last Day' and segment values are encoded as integer codes once, then every metric of every segment
+    is aggregated with bincount over the shared codes instead of filtering the frame per segment value.
+
+    :param df: The input DataFrame containing the subscription data.
+    :param segments: list, The column names in the DataFrame to break the metrics down by, e.g. ['Country', 'Device'].
+    :param revenue: The column name in the DataFrame that represents the revenue.
+    :param user_id: The column name in the DataFrame that represents unique user identifiers.
+    :param plan_duration: The column name in the DatFrame that represents the plan duration in format 'x months'.
+    :param date_column: The column name in the DataFrame that represents the payment dates.
+    :param cross: (optional) tuple of two column names whose value pairs are added as one more segment.
+    :return: DataFrame with columns 'Segment', 'Value', 'Users', 'ARPU', 'Churn Rate' and 'LTV'.
+    For the cross segment, 'Segment' is the tuple of the two column names and 'Value' the tuple of their values.
+    """
+
+    user_codes, user_labels = pd.factorize(df[user_id])
+    n_users = max(len(user_labels), 1)
+    revenues = np.nan_to_num(df[revenue].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+    payment_dates = pd.to_datetime(df[date_column]).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    last_days = sb.last_day(df=df, date_column=date_column,
+                            plan_duration=plan_duration).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+    has_user = user_codes >= 0
+    segment_codes = {}
+    for segment in set(segments) | set(cross or ()):
+        segment_codes[segment] = pd.factorize(df[segment], sort=True)
+
+    rows = []
+    for segment in segments:
+        codes, labels = segment_codes[segment]
+        codes = np.where(has_user, codes, -1)
+        rows += _segment_metric_rows(segment=segment, labels=list(labels), codes=codes, user_codes=user_codes,
+                                     n_users=n_users, revenues=revenues, payment_dates=payment_dates,
+                                     last_days=last_days)
+
+    if cross:
+        first, second = cross
+        first_codes, first_labels = segment_codes[first]
+        second_codes, second_labels = segment_codes[second]
+        codes = np.where(has_user & (first_codes >= 0) & (second_codes >= 0),
+                         first_codes * len(second_labels) + second_codes, -1)
+        labels = [(first_label, second_label) for first_label in first_labels for second_label in second_labels]
+        rows += _segment_metric_rows(segment=tuple(cross), labels=labels, codes=codes, user_codes=user_codes,
+                                     n_users=n_users, revenues=revenues, payment_dates=payment_dates,
+                                     last_days=last_days)
+
+    segment_metrics_df = pd.DataFrame(rows, columns=['Segment', 'Value', 'Users', 'ARPU', 'Churn Rate', 'LTV'])
+
+    return segment_metrics_df
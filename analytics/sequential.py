@@ -0,0 +1,256 @@
+import math
+import numpy as np
+import pandas as pd
+
+
+class RunningStats:
+    """
+    Running count, mean and variance of a stream of observations, updated in O(1) per observation with Welford's
+    algorithm. Batches and other RunningStats are merged with Chan's parallel formula.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        """
+        Adds one observation. A missing value is skipped.
+
+        :param x: float, The observation
+        """
+
+        if pd.isna(x):
+            return
+
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def update_many(self, values):
+        """
+        Adds a batch of observations. Missing values are skipped.
+
+        :param values: array-like, The observations
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        batch = RunningStats()
+        batch.n = len(values)
+        batch.mean = values.mean()
+        batch.m2 = ((values - batch.mean) ** 2).sum()
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Adds the observations summarized by another RunningStats.
+
+        :param other: RunningStats, The statistics to add
+        """
+
+        n = self.n + other.n
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+
+    @property
+    def variance(self):
+        """
+        The sample variance (ddof=1) of the observations.
+        """
+
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.n > 1 else np.nan
+
+
+class ProportionCounter:
+    """
+    Running number of trials and successes of a stream of binary outcomes, updated in O(1) per outcome.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.successes = 0
+
+    def update(self, success):
+        """
+        Adds one outcome. A missing outcome is skipped.
+
+        :param success: bool, Whether the outcome is a success
+        """
+
+        if pd.isna(success):
+            return
+
+        self.n += 1
+        self.successes += int(bool(success))
+
+    def update_many(self, outcomes):
+        """
+        Adds a batch of outcomes. Missing outcomes are skipped.
+
+        :param outcomes: array-like of bool, The outcomes
+        """
+
+        outcomes = np.asarray(outcomes, dtype=np.float64)
+        outcomes = outcomes[~np.isnan(outcomes)].astype(bool)
+        self.n += len(outcomes)
+        self.successes += int(outcomes.sum())
+
+    def merge(self, other):
+        """
+        Adds the outcomes counted by another ProportionCounter.
+
+        :param other: ProportionCounter, The counts to add
+        """
+
+        self.n += other.n
+        self.successes += other.successes
+
+    @property
+    def mean(self):
+        return self.successes / self.n if self.n else np.nan
+
+    @property
+    def variance(self):
+        return self.mean * (1 - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.n else np.nan
+
+
+def msprt_p_value(difference, variance, tau):
+    """
+    Calculates the p-value of one look of a mixture sequential probability ratio test (mSPRT) on a difference of
+    means with a normal mixing distribution N(0, tau^2) over the true difference. The running minimum of these
+    p-values over the looks is valid whenever the experiment is stopped.
+    H0: the true difference is zero.
+
+    :param difference: float, The observed difference of means
+    :param variance: float, The variance of the observed difference (std1^2 / n1 + std2^2 / n2)
+    :param tau: float, The standard deviation of the mixing distribution, the scale of the expected differences
+    :return: float, The p-value of this look
+    """
+
+    if not variance > 0:
+        return 1.0
+
+    tau_squared = tau ** 2
+    log_likelihood_ratio = (0.5 * math.log(variance / (variance + tau_squared)) +
+                            difference ** 2 * tau_squared / (2 * variance * (variance + tau_squared)))
+
+    return min(1.0, math.exp(-log_likelihood_ratio))
+
+
+class ExperimentMonitor:
+    """
+    Online monitor of a running experiment. Every event updates the accumulator of its arm in O(1), and the
+    sequential p-values are computed from the accumulators, so a look costs the same however many events came in.
+
+    The p-value of a comparison is the always-valid mSPRT p-value: the minimum over all looks so far of the p-value
+    of each look. It can be checked after every refresh and the experiment stopped as soon as it drops under alpha,
+    without inflating the false positive rate as repeated fixed-sample tests do.
+    """
+
+    def __init__(self, metric='mean', tau=None):
+        """
+        :param metric: str, optional, 'mean' for a numerical metric or 'proportion' for a binary one. Defaults to
+        'mean'.
+        :param tau: float, optional, The scale of the differences the test is tuned to detect, in the units of the
+        metric. Defaults to the pooled standard deviation at the first look, and is then kept fixed.
+        """
+
+        if metric not in ('mean', 'proportion'):
+            raise ValueError("metric must be 'mean' or 'proportion'")
+
+        self.metric = metric
+        self.tau = tau
+        self.arms = {}
+        self._p_values = {}
+
+    def _arm(self, arm):
+        if arm not in self.arms:
+            self.arms[arm] = RunningStats() if self.metric == 'mean' else ProportionCounter()
+        return self.arms[arm]
+
+    def add(self, arm, value):
+        """
+        Records one event.
+
+        :param arm: The arm of the experiment the event belongs to
+        :param value: float or bool, The value of the metric for this event
+        """
+
+        self._arm(arm).update(value)
+
+    def add_many(self, arm, values):
+        """
+        Records a batch of events of one arm.
+
+        :param arm: The arm of the experiment the events belong to
+        :param values: array-like, The values of the metric
+        """
+
+        self._arm(arm).update_many(values)
+
+    def add_events(self, df, arm_column, value_column):
+        """
+        Records a dataframe of events, such as the rows that arrived since the last refresh.
+
+        :param df: pandas.DataFrame, The events
+        :param arm_column: str, The column in the dataframe with the arm of every event
+        :param value_column: str, The column in the dataframe with the value of the metric
+        """
+
+        for arm, values in df.groupby(arm_column, sort=False)[value_column]:
+            self.add_many(arm, values.to_numpy())
+
+    def p_value(self, arm1, arm2):
+        """
+        Looks at the experiment and gives the always-valid p-value of the difference between two arms.
+        H0: the metric has the same mean in both arms.
+
+        :param arm1: The first arm to compare
+        :param arm2: The second arm to compare
+        :return: float, The sequential p-value, the running minimum over all looks at this pair of arms
+        """
+
+        stats1 = self._arm(arm1)
+        stats2 = self._arm(arm2)
+        if stats1.n < 2 or stats2.n < 2:
+            return self._p_values.get((arm1, arm2), 1.0)
+
+        variance = stats1.variance / stats1.n + stats2.variance / stats2.n
+        if self.tau is None:
+            pooled_variance = ((stats1.n - 1) * stats1.variance + (stats2.n - 1) * stats2.variance) / \
+                              (stats1.n + stats2.n - 2)
+            self.tau = math.sqrt(pooled_variance)
+
+        p_value = msprt_p_value(difference=stats1.mean - stats2.mean, variance=variance, tau=self.tau)
+        p_value = min(p_value, self._p_values.get((arm1, arm2), 1.0))
+        self._p_values[(arm1, arm2)] = p_value
+
+        return p_value
+
+    def summary(self):
+        """
+        Describes the arms of the experiment.
+
+        :return: pandas.DataFrame with columns 'Arm', 'N', 'Mean' and 'Std'
+        """
+
+        return pd.DataFrame([(arm, stats.n, stats.mean, stats.std) for arm, stats in self.arms.items()],
+                            columns=['Arm', 'N', 'Mean', 'Std'])
@@ -1,9 +1,34 @@
-import itertools
-from scipy.stats import norm, shapiro, t, f, chi2
+from scipy.stats import norm, t, f, chi2
 import numpy as np
-import math
+import pandas as pd
 from functools import reduce
 import operator
+from .sufficient_stats import GroupStats, ContingencyStats, group_sufficient_statistics, squares_about_mean
+from .normality import check_normality
+from .group_index import GroupIndex
+
+
+def _tail_p_value(statistic, distribution, tail, **parameters):
+    """
+    Calculates the p-values of test statistics with one vectorized sf or cdf call of a scipy distribution.
+
+    :param statistic: float or numpy.ndarray, The test statistics
+    :param distribution: scipy.stats distribution, The distribution of the statistic under H0
+    :param tail: str, The type of test to perform. Must be 'right', 'left', or 'two'.
+    :param parameters: float or numpy.ndarray, The parameters of the distribution, broadcast against statistic
+    :return: float or numpy.ndarray, The p-values, a scalar for scalar inputs
+    """
+
+    if tail == 'right':
+        p_value = distribution.sf(statistic, **parameters)
+    elif tail == 'left':
+        p_value = distribution.cdf(statistic, **parameters)
+    elif tail == 'two':
+        p_value = 2 * distribution.sf(np.abs(statistic), **parameters)
+    else:
+        raise ValueError("tail must be 'right', 'left', or 'two'")
+
+    return np.asarray(p_value)[()]
 
 
 def z_test(x, mean, stdev, right_tailed=True):
@@ -11,44 +36,48 @@ def z_test(x, mean, stdev, right_tailed=True):
     Calculates the p-value for a given z-score.
     H0: the observed value x is not significantly different from the population mean.
 
-    :param x: float, The observed value
-    :param mean: float, The mean of the population
-    :param stdev: float, The standard deviation of the population
+    All numerical arguments can also be numpy arrays, which are broadcast against each other.
+
+    :param x: float or numpy.ndarray, The observed value
+    :param mean: float or numpy.ndarray, The mean of the population
+    :param stdev: float or numpy.ndarray, The standard deviation of the population
     :param right_tailed: bool, optional, If True, performs a right-tailed test. If False, performs a left-tailed test. Defaults to True.
-    :return: float, The calculated p-value
+    :return: float or numpy.ndarray, The calculated p-value
     """
 
-    z_score = (x-mean)/stdev
-    if right_tailed == True:
-        p_value = (1-norm.cdf(z_score))
-    elif right_tailed == False:
-        p_value = (norm.cdf(z_score))
-    else:
+    z_score = (np.asarray(x) - mean) / stdev
+    if right_tailed not in (True, False):
         raise ValueError("right_tailed must be True or False")
-    return p_value
+    tail = 'right' if right_tailed else 'left'
+    return _tail_p_value(statistic=z_score, distribution=norm, tail=tail)
 
 
-def z_test_for_df(point, df, column, right_tailed=True):
+def z_test_for_df(point, df, column, right_tailed=True, stats=None, normality_method='shapiro'):
     """
     Calculates the p-value for a given point from a dataframe column using the z-test.
     H0: the observed value x is not significantly different from the population mean.
 
     :param point: float, The observed value
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param column: str, The column in the dataframe to perform the test on
     :param right_tailed: bool, optional, If True, performs a right-tailed test. If False, performs a left-tailed test. Defaults to True.
+    :param stats: GroupStats, optional, Statistics of the column. All groups are pooled, and the normality check,
+    which needs the raw values, is skipped.
+    :param normality_method: str, optional, The normality check reported when the data is not normal: 'shapiro',
+    'dagostino' or 'anderson', see normality.normality_p_value. None skips the check. Defaults to 'shapiro'.
     :return: float, The calculated p-value
     """
 
+    if stats is not None:
+        mean, stdev, n = stats.total().describe('all')
+        return z_test(x=point, mean=mean, stdev=stdev, right_tailed=right_tailed)
+
     mean = df[column].mean()
     stdev = df[column].std()
-    normality = shapiro(df[column])[1]
+    if normality_method is not None:
+        check_normality(df[column], label=column, method=normality_method)
 
-    if normality <= 0.05:
-        p_value = z_test(x=point, mean=mean, stdev=stdev, right_tailed=right_tailed)
-    else:
-        print(f"Data not normally distributed. Shapiro-Wilk test p-value is {normality}")
-        p_value = z_test(x=point, mean=mean, stdev=stdev, right_tailed=right_tailed)
+    p_value = z_test(x=point, mean=mean, stdev=stdev, right_tailed=right_tailed)
 
     return p_value
 
@@ -58,49 +87,61 @@ def unpaired_t_test(x1, x2, std1, std2, n1, n2, tail='two'):
     Calculates the p-value for an unpaired t-test.
     H0: the mean of the first sample x1 is not significantly different from the mean of the second sample x2.
 
-    :param x1: float, The mean of the first sample
-    :param x2: float, The mean of the second sample
-    :param std1: float, The standard deviation of the first sample
-    :param std2: float, The standard deviation of the second sample
-    :param n1: int, The size of the first sample
-    :param n2: int, The size of the second sample
+    All numerical arguments can also be numpy arrays, which are broadcast against each other.
+
+    :param x1: float or numpy.ndarray, The mean of the first sample
+    :param x2: float or numpy.ndarray, The mean of the second sample
+    :param std1: float or numpy.ndarray, The standard deviation of the first sample
+    :param std2: float or numpy.ndarray, The standard deviation of the second sample
+    :param n1: int or numpy.ndarray, The size of the first sample
+    :param n2: int or numpy.ndarray, The size of the second sample
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
-    :return: float, The calculated p-value
+    :return: float or numpy.ndarray, The calculated p-value
     """
 
-    se1 = (std1 ** 2)/ n1
-    se2 = (std2 ** 2) / n2
-    t_stat = (x1-x2)/math.sqrt(se1+se2)
-    degrees_of_freedom = (n1+n2)-2
-
-    if tail == 'right':
-        p_value = 1 - t.cdf(t_stat, df=degrees_of_freedom)
-    elif tail == 'left':
-        p_value = t.cdf(t_stat, df=degrees_of_freedom)
-    elif tail == 'two':
-        p_value = 2 * (1 - abs(t.cdf(abs(t_stat), df=degrees_of_freedom)))
-    else:
-        raise ValueError("tail must be 'right', 'left', or 'two'")
+    se1 = (np.asarray(std1) ** 2) / n1
+    se2 = (np.asarray(std2) ** 2) / n2
+    t_stat = (np.asarray(x1) - x2) / np.sqrt(se1 + se2)
+    degrees_of_freedom = (np.asarray(n1) + n2) - 2
 
-    return p_value
+    return _tail_p_value(statistic=t_stat, distribution=t, tail=tail, df=degrees_of_freedom)
 
 
-def unpaired_t_test_for_df(df, category_column, group1, group2, numerical_column, tail='two'):
+def unpaired_t_test_for_df(df, category_column, group1, group2, numerical_column, tail='two', stats=None,
+                           normality_method=None, group_index=None):
     """
     Calculates the p-value for an unpaired t-test for a given point from a dataframe column.
     H0: The mean of the first sample x1 is not significantly different from the mean of the second sample x2.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param category_column: str, The column in the dataframe to group by
     :param group1: str, The first group to compare
     :param group2: str, The second group to compare
     :param numerical_column: str, The column in the dataframe to perform the test on
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param stats: GroupStats, optional, Statistics of numerical_column per group of category_column
+    :param normality_method: str, optional, Checks that both groups are normal with this method ('shapiro',
+    'dagostino' or 'anderson') and reports when they are not. Defaults to None, no check.
+    :param group_index: GroupIndex, optional, The index of category_column in df, to look up the rows of the groups
+    instead of scanning the column when the same dataframe is tested repeatedly
     :return: float, The calculated p-value
     """
 
-    df_for_group1 = df[df[category_column] == group1]
-    df_for_group2 = df[df[category_column] == group2]
+    if stats is not None:
+        x1, std1, n1 = stats.describe(group1)
+        x2, std2, n2 = stats.describe(group2)
+        return unpaired_t_test(x1=x1, x2=x2, std1=std1, std2=std2, n1=n1, n2=n2, tail=tail)
+
+    if group_index is not None:
+        df_for_group1 = df.iloc[group_index.positions(group1)]
+        df_for_group2 = df.iloc[group_index.positions(group2)]
+    else:
+        df_for_group1 = df[df[category_column] == group1]
+        df_for_group2 = df[df[category_column] == group2]
+    if normality_method is not None:
+        for group, df_for_group in ((group1, df_for_group1), (group2, df_for_group2)):
+            check_normality(df_for_group[numerical_column], label=f"{numerical_column}, {group}",
+                            method=normality_method)
 
     x1 = df_for_group1[numerical_column].mean()
     x2 = df_for_group2[numerical_column].mean()
@@ -119,56 +160,97 @@ def paired_t_test(differences_mean, differences_stdev, n, tail='two'):
     Calculates the p-value for a paired t-test.
     H0: the mean of the differences differences_mean is not significantly different from zero.
 
-    :param differences_mean: float, The mean of the differences
-    :param differences_stdev: float, The standard deviation of the differences
-    :param n: int, The number of differences
+    All numerical arguments can also be numpy arrays, which are broadcast against each other.
+
+    :param differences_mean: float or numpy.ndarray, The mean of the differences
+    :param differences_stdev: float or numpy.ndarray, The standard deviation of the differences
+    :param n: int or numpy.ndarray, The number of differences
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
-    :return: float, The calculated p-value
+    :return: float or numpy.ndarray, The calculated p-value
     """
 
-    t_stat = (differences_mean * math.sqrt(n)) / differences_stdev
-    degrees_of_freedom = n - 1
+    t_stat = (np.asarray(differences_mean) * np.sqrt(n)) / differences_stdev
+    degrees_of_freedom = np.asarray(n) - 1
 
-    if tail == 'right':
-        p_value = 1 - t.cdf(t_stat, df=degrees_of_freedom)
-    elif tail == 'left':
-        p_value = t.cdf(t_stat, df=degrees_of_freedom)
-    elif tail == 'two':
-        p_value = 2 * (1 - abs(t.cdf(abs(t_stat), df=degrees_of_freedom)))
-    else:
-        raise ValueError("tail must be 'right', 'left', or 'two'")
+    return _tail_p_value(statistic=t_stat, distribution=t, tail=tail, df=degrees_of_freedom)
 
-    return p_value
 
+def paired_differences(df, id_column, period_column, period1, period2, numerical_column, duplicates='first'):
+    """
+    Calculates the difference period1 - period2 of a numerical column for every entity observed in both periods.
+    The rows of the two periods are joined on the id column once, instead of filtering the dataframe per entity.
 
-def paired_t_test_for_df(df, id_column, period_column, period1, period2, numerical_column, tail='two'):
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param id_column: str, The column in the dataframe to identify unique entities
+    :param period_column: str, The column in the dataframe to identify the periods
+    :param period1: str, The first period to compare
+    :param period2: str, The second period to compare
+    :param numerical_column: str, The column in the dataframe to compute the differences on
+    :param duplicates: str, optional, What to do with an entity that has several rows in a period. 'first' and 'last'
+    keep the first or last row in dataframe order, 'mean' and 'sum' aggregate the rows (ignoring missing values).
+    Defaults to 'first'.
+    :return: pandas.Series, The differences indexed by entity, in order of first appearance of the entity
+    """
+
+    if duplicates not in ('first', 'last', 'mean', 'sum'):
+        raise ValueError("duplicates must be 'first', 'last', 'mean' or 'sum'")
+
+    df_for_periods = df.loc[df[id_column].notna(), [id_column, period_column, numerical_column]]
+
+    values_by_period = []
+    for period in (period1, period2):
+        df_period = df_for_periods[df_for_periods[period_column] == period]
+        if duplicates in ('first', 'last'):
+            values = df_period.drop_duplicates(subset=id_column, keep=duplicates).set_index(id_column)
+            values = values[numerical_column]
+        else:
+            values = df_period.groupby(id_column, sort=False)[numerical_column].agg(duplicates)
+        values_by_period.append(values)
+
+    both_periods = pd.concat(values_by_period, axis=1, join='inner', keys=['period1', 'period2'])
+    order = pd.Index(df_for_periods[id_column].unique())
+    both_periods = both_periods.iloc[np.argsort(order.get_indexer(both_periods.index), kind='stable')]
+
+    differences = both_periods['period1'] - both_periods['period2']
+    differences.name = numerical_column
+
+    return differences
+
+
+def paired_t_test_for_df(df, id_column, period_column, period1, period2, numerical_column, tail='two', stats=None,
+                         duplicates='first', normality_method=None):
     """
     Calculates the p-value for a paired t-test for a given point from a dataframe column.
     H0: the mean of the differences is not significantly different from zero.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param id_column: str, The column in the dataframe to identify unique entities
     :param period_column: str, The column in the dataframe to identify the periods
     :param period1: str, The first period to compare
     :param period2: str, The second period to compare
     :param numerical_column: str, The column in the dataframe to perform the test on
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param stats: GroupStats, optional, Statistics of the differences period1 - period2, all groups are pooled
+    :param duplicates: str, optional, The policy for entities with several rows in a period, see paired_differences.
+    Defaults to 'first'.
+    :param normality_method: str, optional, Checks that the differences are normal with this method ('shapiro',
+    'dagostino' or 'anderson') and reports when they are not. Defaults to None, no check.
     :return: float, The calculated p-value
     """
 
-    list_of_differences = []
+    if stats is not None:
+        differences_mean, differences_stdev, n = stats.total().describe('all')
+        return paired_t_test(differences_mean=differences_mean, differences_stdev=differences_stdev, n=n, tail=tail)
 
-    for unique_id in df[id_column].unique():
-        dataframe = df[df[id_column] == unique_id]
-        if period1 in dataframe[period_column].values and period2 in dataframe[period_column].values:
-            value_period1 = dataframe[dataframe[period_column] == period1][numerical_column].values[0]
-            value_period2 = dataframe[dataframe[period_column] == period2][numerical_column].values[0]
-            difference = value_period1 - value_period2
-            list_of_differences.append(difference)
+    differences = paired_differences(df=df, id_column=id_column, period_column=period_column, period1=period1,
+                                     period2=period2, numerical_column=numerical_column,
+                                     duplicates=duplicates).to_numpy(dtype=np.float64)
+    if normality_method is not None:
+        check_normality(differences, label=f"{numerical_column}, {period1} - {period2}", method=normality_method)
 
-    differences_mean = np.mean(list_of_differences)
-    differences_stdev = np.std(list_of_differences, ddof=1)
-    n = len(list_of_differences)
+    differences_mean = np.mean(differences)
+    differences_stdev = np.std(differences, ddof=1)
+    n = len(differences)
     p_value = paired_t_test(differences_mean=differences_mean, differences_stdev=differences_stdev, n=n, tail=tail)
     return p_value
 
@@ -185,7 +267,9 @@ def one_way_anova(sst, ssw, n, k):
     :return: float, The calculated p-value
     """
 
-    ssb = sst - ssw
+    # Rounding in closed-form sums of squares can leave them slightly negative
+    ssw = np.maximum(ssw, 0)
+    ssb = np.maximum(sst - ssw, 0)
     degrees_of_freedom_within = n - k
     degrees_of_freedom_between = k - 1
 
@@ -198,41 +282,57 @@ def one_way_anova(sst, ssw, n, k):
     return p_value
 
 
-def one_way_anova_for_df(df, category_column, group_of_interest, numerical_column):
+def one_way_anova_for_df(df, category_column, group_of_interest, numerical_column, group_stats=None,
+                         normality_method=None):
     """
     Calculates the p-value for a one-way ANOVA test for a given point from a dataframe column.
     H0: all group means are equal.
+    The sums of squares are derived from the count, sum and sum of squared deviations from the mean (m2) of every
+    group, which come from one groupby pass, or directly from group_stats when the data is already aggregated.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when group_stats is given.
     :param category_column: str, The column in the dataframe to group by
-    :param group_of_interest: list, The groups to compare
+    :param group_of_interest: list, The groups to compare. When None, all groups in group_stats are compared.
     :param numerical_column: str, The column in the dataframe to perform the test on
+    :param group_stats: GroupStats or pandas.DataFrame, optional, Pre-aggregated statistics indexed by group with
+    columns 'count', 'sum', 'sum_of_squares' and 'm2', as returned by group_sufficient_statistics
+    :param normality_method: str, optional, Checks that every group is normal with this method ('shapiro',
+    'dagostino' or 'anderson') and reports the groups that are not. Needs df. Defaults to None, no check.
     :return: float, The calculated p-value
     """
 
-    df_for_anova = df[df[category_column].isin(group_of_interest)]
-    grand_mean = df_for_anova[numerical_column].mean()
+    if isinstance(group_stats, GroupStats):
+        group_stats = group_stats.table
+
+    if group_stats is None:
+        df_for_anova = df[df[category_column].isin(group_of_interest)]
+        if normality_method is not None:
+            for group, values in df_for_anova.groupby(category_column, sort=False)[numerical_column]:
+                check_normality(values, label=f"{numerical_column}, {group}", method=normality_method)
+        grand_mean = df_for_anova[numerical_column].mean()
+        group_stats = group_sufficient_statistics(df=df_for_anova, category_column=category_column,
+                                                  numerical_column=numerical_column, center=grand_mean)
+    elif group_of_interest is not None:
+        group_stats = group_stats[group_stats.index.isin(group_of_interest)]
+
+    group_stats = group_stats[group_stats['count'] > 0]
+    n = group_stats['count'].sum()
+    total_sum = group_stats['sum'].sum()
 
-    sst = 0
-    for row in df_for_anova[numerical_column]:
-        sst += ((row - grand_mean) ** 2)
+    group_means = group_stats['sum'] / group_stats['count']
 
-    ssw = 0
-    for group in group_of_interest:
-        df_of_a_group = df_for_anova[df_for_anova[category_column] == group]
-        group_mean = df_of_a_group[numerical_column].mean()
-        for row in df_of_a_group[numerical_column]:
-            ssw += ((row - group_mean) ** 2)
+    # Both sums of squares are sums of squared deviations, so cancellation cannot make them negative
+    ssw = squares_about_mean(group_stats).sum()
+    sst = ssw + (group_stats['count'] * (group_means - total_sum / n) ** 2).sum()
 
-    n = len(df_for_anova)
-    k = len(group_of_interest)
+    k = len(group_of_interest) if group_of_interest is not None else len(group_stats)
 
     p_value = one_way_anova(sst=sst, ssw=ssw, n=n, k=k)
 
     return p_value
 
 
-def two_way_anova(ssa, ssb, ssw, ssi, n, k_a, k_b):
+def two_way_anova(ssa, ssb, ssw, ssi, n, k_a, k_b, n_cells=None):
     """
     Calculates the p-values for a two-way ANOVA test.
     H0 for the first factor: All group means are equal at each level of the first factor.
@@ -246,13 +346,17 @@ def two_way_anova(ssa, ssb, ssw, ssi, n, k_a, k_b):
     :param n: int, The total number of observations
     :param k_a: int, The number of levels for the first factor
     :param k_b: int, The number of levels for the second factor
+    :param n_cells: int, optional, The number of non-empty level combinations. Defaults to k_a * k_b.
     :return: tuple, The calculated p-values for the first factor, the second factor, and the interaction
     """
 
-    degrees_of_freedom_within = n - (k_a * k_b) # n - k_a * k_b
+    if n_cells is None:
+        n_cells = k_a * k_b
+
+    degrees_of_freedom_within = n - n_cells
     degrees_of_freedom_a = k_a - 1
     degrees_of_freedom_b = k_b - 1
-    degrees_of_freedom_interaction = (k_a - 1) * (k_b - 1)
+    degrees_of_freedom_interaction = n_cells - 1 - degrees_of_freedom_a - degrees_of_freedom_b
 
     msw = ssw / degrees_of_freedom_within
     msa = ssa / degrees_of_freedom_a
@@ -270,76 +374,39 @@ def two_way_anova(ssa, ssb, ssw, ssi, n, k_a, k_b):
     return p_value_a, p_value_b, p_value_interaction
 
 
-def two_way_anova_for_df(df, dictionary_with_groups, numerical_column):
+def two_way_anova_for_df(df, dictionary_with_groups, numerical_column, cell_stats=None):
     """
     Calculates the p-values for a two-way ANOVA test for a given point from a dataframe column.
     H0 for the first factor: All group means are equal at each level of the first factor.
     H0 for the second factor: All group means are equal at each level of the second factor.
     H0 for the interaction effect: There is no interaction effect between the two factors.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when cell_stats is given.
     :param dictionary_with_groups: dict, The dictionary with the two factors and their levels
     :param numerical_column: str, The column in the dataframe to perform the test on
+    :param cell_stats: GroupStats or pandas.DataFrame, optional, Pre-aggregated statistics of every combination of
+    levels, see n_way_sums_of_squares
     :return: dict, The calculated p-values for the first factor, the second factor, and the interaction
     """
 
-    var1 = list(dictionary_with_groups.keys())[0]
-    var2 = list(dictionary_with_groups.keys())[1]
-
-    df_for_two_way_anova = df[[var1, var2, numerical_column]]
-
-    group_of_interest_1 = dictionary_with_groups[var1]
-    group_of_interest_2 = dictionary_with_groups[var2]
-
-    df1 = df_for_two_way_anova[df_for_two_way_anova[var1].isin(group_of_interest_1)]
-    df2 = df_for_two_way_anova[df_for_two_way_anova[var2].isin(group_of_interest_2)]
-
-    k_a = len(group_of_interest_1)
-    k_b = len(group_of_interest_2)
-
-    grand_mean = df_for_two_way_anova[numerical_column].mean()
-
-    ssa = 0
-    for level in group_of_interest_1:
-        df1_group = df1[df1[var1] == level][numerical_column]
-        df1_group_mean = df1_group.mean()
-        ssa += ((df1_group_mean - grand_mean) ** 2)
-
-    ssb = 0
-    for group in group_of_interest_2:
-        df2_group = df2[df2[var2] == group][numerical_column]
-        df2_group_mean = df2_group.mean()
-        ssb += ((df2_group_mean - grand_mean) ** 2)
-
-    ssw = 0
-    for level_a in group_of_interest_1:
-        for level_b in group_of_interest_2:
-            df_group = df_for_two_way_anova[(df_for_two_way_anova[var1] == level_a) &
-                                            (df_for_two_way_anova[var2] == level_b)][numerical_column]
-            group_mean = df_group.mean()
-            for row in df_group:
-                ssw += ((row - group_mean) ** 2)
-
-    sst = 0
-    for level_a in group_of_interest_1:
-        for level_b in group_of_interest_2:
-            df_ab = df_for_two_way_anova[(df_for_two_way_anova[var1] == level_a) & (
-                        df_for_two_way_anova[var2] == level_b)][numerical_column]
-            for row in df_ab:
-                sst += ((row - grand_mean) ** 2)
-
-    ssi = sst - ssa - ssb - ssw
+    var1, var2 = list(dictionary_with_groups.keys())[:2]
 
-    n = len(df_for_two_way_anova)
+    sums_of_squares = n_way_sums_of_squares(df=df, dictionary_with_groups={var1: dictionary_with_groups[var1],
+                                                                           var2: dictionary_with_groups[var2]},
+                                            numerical_column=numerical_column, cell_stats=cell_stats)
+    ssa, ssb = sums_of_squares['ss_n']
+    k_a, k_b = sums_of_squares['k_n']
 
-    p_value_a, p_value_b, p_value_interaction = two_way_anova(ssa=ssa, ssb=ssb, ssw=ssw, ssi=ssi, n=n, k_a=k_a, k_b=k_b)
+    p_value_a, p_value_b, p_value_interaction = two_way_anova(ssa=ssa, ssb=ssb, ssw=sums_of_squares['ssw'],
+                                                              ssi=sums_of_squares['ssi'], n=sums_of_squares['n'],
+                                                              k_a=k_a, k_b=k_b, n_cells=sums_of_squares['n_cells'])
 
     p_values = {var1: p_value_a, var2: p_value_b, 'interaction': p_value_interaction}
 
     return p_values
 
 
-def n_way_anova(ss_n, ssw, ssi, n, k_n, groups):
+def n_way_anova(ss_n, ssw, ssi, n, k_n, groups, n_cells=None):
     """
     Calculates the p-values for an n-way ANOVA test.
     H0 for each factor: All group means are equal at each level of each factor.
@@ -347,20 +414,23 @@ def n_way_anova(ss_n, ssw, ssi, n, k_n, groups):
 
     :param ss_n: list, The sum of squares for each factor
     :param ssw: float, The sum of squares within groups
-    :param ssi: float, The sum of squares for the interaction
+    :param ssi: float, The sum of squares for all interactions together
     :param n: int, The total number of observations
     :param k_n: list, The number of levels for each factor
     :param groups: list, The names of the groups
+    :param n_cells: int, optional, The number of non-empty level combinations. Defaults to the product of k_n.
     :return: list, The calculated p-values for each factor and the interaction
     """
 
+    if n_cells is None:
+        n_cells = reduce(operator.mul, k_n)
+
     degrees_of_freedom = []
-    degrees_of_freedom_within = n - (reduce(operator.mul, k_n))
+    degrees_of_freedom_within = n - n_cells
     for k in k_n:
-        degree_of_freedom = k -1
+        degree_of_freedom = k - 1
         degrees_of_freedom.append(degree_of_freedom)
-    k_n_minus_1 = [x - 1 for x in k_n]
-    degrees_of_freedom_interaction = reduce(operator.mul, k_n_minus_1)
+    degrees_of_freedom_interaction = n_cells - 1 - sum(degrees_of_freedom)
 
     msw = ssw / degrees_of_freedom_within
     ms_n = []
@@ -389,80 +459,113 @@ def n_way_anova(ss_n, ssw, ssi, n, k_n, groups):
     return results
 
 
-def n_way_anova_for_df(df, dictionary_with_groups, numerical_column):
+def _weighted_residual_squares(cell_means, cell_counts, factor_codes):
     """
-    Calculates the p-values for an n-way ANOVA test for a given point from a dataframe column.
-    H0 for each factor: All group means are equal at each level of each factor.
-    H0 for the interaction effect: There is no interaction effect among the factors.
-
-    :param df: pandas.DataFrame, The dataframe containing the data
-    :param dictionary_with_groups: dict, The dictionary with the factors and their levels
-    :param numerical_column: str, The column in the dataframe to perform the test on
-    :return: list, The calculated p-values for each factor and the interaction
+    Fits the additive model of the given factors to the cell means by least squares weighted by the cell sizes and
+    gives its residual sum of squares. On the raw data, the residual sum of squares of the same model is this plus the
+    sum of squares within cells.
     """
 
-    var_n = []
-    for i, key in enumerate(list(dictionary_with_groups.keys()), start=0):
-        var = list(dictionary_with_groups.keys())[i]
-        var_n.append(var)
+    columns = [np.ones(len(cell_means))]
+    for codes in factor_codes:
+        columns.extend((codes == level).astype(np.float64) for level in range(1, codes.max() + 1))
+    design = np.column_stack(columns)
 
-    group_names = var_n
+    root_counts = np.sqrt(cell_counts)
+    coefficients = np.linalg.lstsq(design * root_counts[:, None], cell_means * root_counts, rcond=None)[0]
+    residuals = cell_means - design @ coefficients
 
-    df_for_n_way_anova = df[var_n + [numerical_column]]
+    return (cell_counts * residuals ** 2).sum()
 
-    group_of_interests_n = []
-    for var in var_n:
-        group_of_interests = dictionary_with_groups[var]
-        group_of_interests_n.append(group_of_interests)
 
-    df_n = []
-    for group, var in enumerate(var_n, start=0):
-        df = df_for_n_way_anova[df_for_n_way_anova[var].isin(group_of_interests_n[group])]
-        df_n.append(df)
+def n_way_sums_of_squares(df, dictionary_with_groups, numerical_column, cell_stats=None):
+    """
+    Calculates the sums of squares of an n-way ANOVA from the count, sum and sum of squared deviations (m2) of every
+    combination of levels (cell). The cells come from one groupby pass over the factor columns, or directly from
+    cell_stats, so the cost is linear in the number of rows whatever the number of factors. Only observed cells
+    exist, which makes unbalanced designs and empty cells work.
 
-    k_n = []
-    for n, group in enumerate(group_of_interests_n, start=0):
-        k = len(group_of_interests_n[n])
-        k_n.append(k)
+    The sum of squares within groups is the sum of m2 over the cells. The sum of squares of a factor is of type II:
+    how much the fit of the additive model of all factors improves on the model without it. The interaction is the
+    lack of fit of the additive model, what the cell means add to it. Both models are fitted to the cell means
+    weighted by the cell sizes, which gives the same sums of squares as fitting them to the rows, also with unequal
+    cell sizes. Every sum of squares is clipped at 0 against rounding.
 
-    # print(f"K: {k_n}")
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when cell_stats is given.
+    :param dictionary_with_groups: dict, The dictionary with the factors and their levels
+    :param numerical_column: str, The column in the dataframe to perform the test on
+    :param cell_stats: GroupStats or pandas.DataFrame, optional, Pre-aggregated statistics indexed by the levels of
+    the factors, in the order of dictionary_with_groups, with columns 'count', 'sum', 'sum_of_squares' and 'm2', as
+    returned by group_sufficient_statistics(df, list(dictionary_with_groups), numerical_column)
+    :return: dict, with the factor sums of squares 'ss_n', 'ssw', 'ssi', 'sst', the number of observations 'n',
+    the number of observed levels of every factor 'k_n' and the number of non-empty cells 'n_cells'
+    """
+
+    var_n = list(dictionary_with_groups.keys())
+
+    if isinstance(cell_stats, GroupStats):
+        cell_stats = cell_stats.table
+
+    if cell_stats is None:
+        in_groups = np.ones(len(df), dtype=bool)
+        for var in var_n:
+            in_groups &= df[var].isin(dictionary_with_groups[var]).to_numpy()
+        df_for_n_way_anova = df.loc[in_groups, var_n + [numerical_column]]
+        grand_mean = df_for_n_way_anova[numerical_column].mean()
+        cell_stats = group_sufficient_statistics(df=df_for_n_way_anova, category_column=var_n,
+                                                 numerical_column=numerical_column, center=grand_mean)
+    else:
+        if len(var_n) > 1 and set(cell_stats.index.names) == set(var_n):
+            cell_stats = cell_stats.reorder_levels(var_n)
+        in_groups = np.ones(len(cell_stats), dtype=bool)
+        for level, var in enumerate(var_n):
+            in_groups &= cell_stats.index.get_level_values(level).isin(dictionary_with_groups[var])
+        cell_stats = cell_stats[in_groups]
+
+    cell_stats = cell_stats[cell_stats['count'] > 0]
+    cell_counts = cell_stats['count'].to_numpy(dtype=np.float64)
+    n = cell_counts.sum()
+    cell_means = cell_stats['sum'].to_numpy(dtype=np.float64) / cell_counts
+    cell_means = cell_means - (cell_counts * cell_means).sum() / n
+
+    factor_codes = [pd.factorize(cell_stats.index.get_level_values(level))[0] for level in range(len(var_n))]
+    k_n = [int(codes.max()) + 1 for codes in factor_codes]
+
+    ssw = squares_about_mean(cell_stats).sum()
+    ss_cells = (cell_counts * cell_means ** 2).sum()
+    sst = ssw + ss_cells
+
+    residual_additive = _weighted_residual_squares(cell_means, cell_counts, factor_codes)
+    ss_n = []
+    for level in range(len(var_n)):
+        other_codes = factor_codes[:level] + factor_codes[level + 1:]
+        residual_without = _weighted_residual_squares(cell_means, cell_counts, other_codes)
+        ss_n.append(max(residual_without - residual_additive, 0.0))
+    ssi = max(residual_additive, 0.0)
 
-    grand_mean = df_for_n_way_anova[numerical_column].mean()
+    return {'ss_n': ss_n, 'ssw': ssw, 'ssi': ssi, 'sst': sst, 'n': int(n), 'k_n': k_n, 'n_cells': len(cell_stats)}
 
-    ss_n = []
-    for i in range(len(group_of_interests_n)):
-        ss_nn = 0
-        for group in group_of_interests_n[i]:
-            df_group = df_n[i][df_n[i][var_n[i]] == group][numerical_column]
-            df_group_mean = df_group.mean()
-            ss_nn += ((df_group_mean - grand_mean) ** 2)
-        ss_n.append(ss_nn)
-
-    ssw = 0
-    combinations = list(itertools.product(*group_of_interests_n))
-
-    for combination in combinations:
-        masks = [df_for_n_way_anova[var] == level for var, level in zip(var_n, combination)]
-        combined_mask = masks[0]
-        for mask in masks[1:]:
-            combined_mask &= mask
-        df_group = df_for_n_way_anova[combined_mask][numerical_column]
-        group_mean = df_group.mean()
-        for row in df_group:
-            ssw += ((row - group_mean) ** 2)
-
-    sst = 0
-    for group_of_interest, var in zip(group_of_interests_n, var_n):
-        for level in group_of_interest:
-            df_group = df_for_n_way_anova[df_for_n_way_anova[var] == level][numerical_column]
-            for row in df_group:
-                sst += ((row - grand_mean) ** 2)
-
-    ssi = sst - sum([(-1)*ss for ss in ss_n]) - ssw
-
-    n = len(df_for_n_way_anova)
-
-    p_values = n_way_anova(ss_n=ss_n, ssw=ssw, ssi=ssi, n=n, k_n=k_n, groups=group_names)
+
+def n_way_anova_for_df(df, dictionary_with_groups, numerical_column, cell_stats=None):
+    """
+    Calculates the p-values for an n-way ANOVA test for a given point from a dataframe column.
+    H0 for each factor: All group means are equal at each level of each factor.
+    H0 for the interaction effect: There is no interaction effect among the factors.
+
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when cell_stats is given.
+    :param dictionary_with_groups: dict, The dictionary with the factors and their levels
+    :param numerical_column: str, The column in the dataframe to perform the test on
+    :param cell_stats: GroupStats or pandas.DataFrame, optional, Pre-aggregated statistics of every combination of
+    levels, see n_way_sums_of_squares
+    :return: list, The calculated p-values for each factor and the interaction
+    """
+
+    sums_of_squares = n_way_sums_of_squares(df=df, dictionary_with_groups=dictionary_with_groups,
+                                            numerical_column=numerical_column, cell_stats=cell_stats)
+
+    p_values = n_way_anova(ss_n=sums_of_squares['ss_n'], ssw=sums_of_squares['ssw'], ssi=sums_of_squares['ssi'],
+                           n=sums_of_squares['n'], k_n=sums_of_squares['k_n'], groups=list(dictionary_with_groups),
+                           n_cells=sums_of_squares['n_cells'])
 
     return p_values
 
@@ -472,47 +575,50 @@ def one_sample_proportion_test(sample_proportion, h0_proportion, n, tail='two'):
     Calculates the p-value for a one-sample proportion test.
     H0: the sample proportion is not significantly different from the hypothesized proportion h0_proportion.
 
-    :param sample_proportion: float, The proportion of the sample
-    :param h0_proportion: float, The null hypothesis proportion
-    :param n: int, The total number of observations
+    All numerical arguments can also be numpy arrays, which are broadcast against each other.
+
+    :param sample_proportion: float or numpy.ndarray, The proportion of the sample
+    :param h0_proportion: float or numpy.ndarray, The null hypothesis proportion
+    :param n: int or numpy.ndarray, The total number of observations
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
-    :return: float, The calculated p-value
+    :return: float or numpy.ndarray, The calculated p-value
     """
 
+    h0_proportion = np.asarray(h0_proportion)
     z_numerator = (sample_proportion - h0_proportion)
-    z_denominator = math.sqrt((h0_proportion*(1-h0_proportion))/n)
-    
+    z_denominator = np.sqrt((h0_proportion*(1-h0_proportion))/n)
+
     z_score = z_numerator / z_denominator
-    if tail == 'right':
-        p_value = 1 - norm.cdf(z_score)
-    elif tail == 'left':
-        p_value = norm.cdf(z_score)
-    elif tail == 'two':
-        if z_score > 0:
-            p_value = 2 * (1 - norm.cdf(z_score))
-        else:
-            p_value = 2 * norm.cdf(z_score)
-    else:
-        raise ValueError("tail must be 'right', 'left', or 'two'")
 
-    return p_value
+    return _tail_p_value(statistic=z_score, distribution=norm, tail=tail)
 
 
-def one_sample_proportion_test_for_df(df, categorical_column, value, h0_proportion, tail='two'):
+def one_sample_proportion_test_for_df(df, categorical_column, value, h0_proportion, tail='two', stats=None,
+                                      group_index=None):
     """
     Calculates the p-value for a one-sample proportion test for a given point from a dataframe column.
     H0: the sample proportion is not significantly different from the hypothesized proportion h0_proportion
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param categorical_column: str, The column in the dataframe to perform the test on
     :param value: str, The value in the categorical column to test
     :param h0_proportion: float, The null hypothesis proportion
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param stats: ContingencyStats, optional, Counts of the categories of categorical_column
+    :param group_index: GroupIndex, optional, The index of categorical_column in df, to count the value without
+    scanning the column
     :return: float, The calculated p-value
     """
 
-    value_occurrence = len(df[df[categorical_column] == value])
-    n = len(df)
+    if stats is not None:
+        value_occurrence = stats.count(value)
+        n = stats.total
+    elif group_index is not None:
+        value_occurrence = group_index.count(value)
+        n = len(df)
+    else:
+        value_occurrence = len(df[df[categorical_column] == value])
+        n = len(df)
     sample_proportion = value_occurrence / n
 
     p_value = one_sample_proportion_test(sample_proportion=sample_proportion, h0_proportion=h0_proportion,
@@ -526,50 +632,65 @@ def two_sample_proportion_test(sample_proportion1, sample_proportion2, n1, n2, t
     H0: the proportion of the first sample sample_proportion1 is not significantly different from the proportion of
     the second sample sample_proportion2.
 
-    :param sample_proportion1: float, The proportion of the first sample
-    :param sample_proportion2: float, The proportion of the second sample
-    :param n1: int, The total number of observations in the first sample
-    :param n2: int, The total number of observations in the second sample
+    All numerical arguments can also be numpy arrays, which are broadcast against each other.
+
+    :param sample_proportion1: float or numpy.ndarray, The proportion of the first sample
+    :param sample_proportion2: float or numpy.ndarray, The proportion of the second sample
+    :param n1: int or numpy.ndarray, The total number of observations in the first sample
+    :param n2: int or numpy.ndarray, The total number of observations in the second sample
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
-    :return: float, The calculated p-value
+    :return: float or numpy.ndarray, The calculated p-value
     """
 
-    proportion = (sample_proportion1 + sample_proportion2) / (n1 + n2)
-    z_numerator = (sample_proportion1-sample_proportion2)
-    z_denominator = math.sqrt((proportion*(1-proportion))*(1/n1 + 1/n2))
+    n1 = np.asarray(n1, dtype=np.float64)
+    proportion = (sample_proportion1 + np.asarray(sample_proportion2)) / (n1 + n2)
+    z_numerator = (sample_proportion1-np.asarray(sample_proportion2))
+    z_denominator = np.sqrt((proportion*(1-proportion))*(1/n1 + 1/n2))
     z_score = z_numerator/z_denominator
 
-    if tail == 'right':
-        p_value = 1 - norm.cdf(z_score)
-    elif tail == 'left':
-        p_value = norm.cdf(z_score)
-    elif tail == 'two':
-        p_value = 2 * (1 - (norm.cdf(abs(z_score))))
-    else:
-        raise ValueError("tail must be 'right', 'left', or 'two'")
-
-    return p_value
+    return _tail_p_value(statistic=z_score, distribution=norm, tail=tail)
 
 
-def two_sample_proportion_test_for_df(df, categorical_column1, categorical_column2, value1, value2, tail='two'):
+def two_sample_proportion_test_for_df(df, categorical_column1, categorical_column2, value1, value2, tail='two',
+                                      stats1=None, stats2=None, group_index1=None, group_index2=None):
     """
     Calculates the p-value for a two-sample proportion test for a given point from a dataframe column.
     H0: the proportion of the first sample is not significantly different from the proportion of the second sample.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats1 and stats2 are given.
     :param categorical_column1: str, The first column in the dataframe to perform the test on
     :param categorical_column2: str, The second column in the dataframe to perform the test on
     :param value1: str, The value in the first categorical column to test
     :param value2: str, The value in the second categorical column to test
     :param tail: str, optional, The type of test to perform. Must be 'right', 'left', or 'two'. Defaults to 'two'.
+    :param stats1: ContingencyStats, optional, Counts of the categories of categorical_column1
+    :param stats2: ContingencyStats, optional, Counts of the categories of categorical_column2
+    :param group_index1: GroupIndex, optional, The index of categorical_column1 in df, to count value1 without
+    scanning the column
+    :param group_index2: GroupIndex, optional, The index of categorical_column2 in df, to count value2 without
+    scanning the column
     :return: float, The calculated p-value
     """
 
-    value1_occurrence = len(df[df[categorical_column1] == value1])
-    n1 = len(df)
-
-    value2_occurrence = len(df[df[categorical_column2] == value2])
-    n2 = len(df)
+    if stats1 is not None:
+        value1_occurrence = stats1.count(value1)
+        n1 = stats1.total
+    elif group_index1 is not None:
+        value1_occurrence = group_index1.count(value1)
+        n1 = len(df)
+    else:
+        value1_occurrence = len(df[df[categorical_column1] == value1])
+        n1 = len(df)
+
+    if stats2 is not None:
+        value2_occurrence = stats2.count(value2)
+        n2 = stats2.total
+    elif group_index2 is not None:
+        value2_occurrence = group_index2.count(value2)
+        n2 = len(df)
+    else:
+        value2_occurrence = len(df[df[categorical_column2] == value2])
+        n2 = len(df)
 
     sample_proportion1 = value1_occurrence / n1
     sample_proportion2 = value2_occurrence / n2
@@ -585,16 +706,17 @@ def chi_square_independence_test(frequencies, cell_values, n_categories, n_group
     Calculates the p-value for a Chi-square test of independence.
     H0: the categorical variables represented by the frequencies and cell_values are independent.
 
-    :param frequencies: list, The expected frequencies
-    :param cell_values: list, The observed frequencies
+    :param frequencies: list or numpy.ndarray, The expected frequencies
+    :param cell_values: list or numpy.ndarray, The observed frequencies
     :param n_categories: int, The number of categories
     :param n_groups: int, The number of groups
     :return: float, The calculated p-value
     """
 
-    chi2_stat = 0
-    for freq, cell in zip(frequencies, cell_values):
-        chi2_stat += ((cell-freq)**2)/freq
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    cell_values = np.asarray(cell_values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi2_stat = (((cell_values - frequencies) ** 2) / frequencies).sum()
 
     degrees_of_freedom = (n_categories - 1) * (n_groups - 1)
     p_value = 1 - chi2.cdf(chi2_stat, df=degrees_of_freedom)
@@ -602,44 +724,65 @@ def chi_square_independence_test(frequencies, cell_values, n_categories, n_group
     return p_value
 
 
-def chi_square_independence_test_for_df(df, group_column, category_column, value_column, value):
+def contingency_table(row_values, column_values):
+    """
+    Counts the observations of every pair of categories with one factorize per column and one bincount over the
+    combined codes. Rows and columns follow the order of first appearance, missing categories are ignored.
+
+    :param row_values: array-like, The category of every observation that becomes the row of the table
+    :param column_values: array-like, The category of every observation that becomes the column of the table
+    :return: pandas.DataFrame, The counts, indexed by the row categories, with the column categories as columns
+    """
+
+    row_codes, row_labels = pd.factorize(np.asarray(row_values))
+    column_codes, column_labels = pd.factorize(np.asarray(column_values))
+
+    observed = (row_codes >= 0) & (column_codes >= 0)
+    combined_codes = row_codes[observed].astype(np.int64) * len(column_labels) + column_codes[observed]
+    counts = np.bincount(combined_codes, minlength=len(row_labels) * len(column_labels))
+
+    return pd.DataFrame(counts.reshape(len(row_labels), len(column_labels)), index=row_labels, columns=column_labels)
+
+
+def chi_square_independence_test_for_df(df, group_column, category_column, value_column, value, stats=None):
     """
     Calculates the p-value for a Chi-square test of independence for a given point from a dataframe column.
     H0: the categorical variables represented by the group_column and category_column in the dataframe df are independent.
+    The observed counts of the rows with value in value_column are built in one pass by contingency_table, and the
+    expected counts are the outer product of its margins.
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param group_column: str, The column in the dataframe to group by
     :param category_column: str, The column in the dataframe to categorize by
     :param value_column: str, The column in the dataframe to perform the test on
     :param value: str, The value in the value column to test
+    :param stats: ContingencyStats, pandas.DataFrame or numpy.ndarray, optional, A precomputed table of the counts of
+    the rows with value in value_column, with the groups as rows and the categories as columns
     :return: float, The calculated p-value
     """
 
-    row_totals = []
-    for group in df[group_column].unique():
-        row = len(df[(df[group_column] == group) & (df[value_column] == value)])
-        row_totals.append(row)
-
-    column_totals = []
-    for category in df[category_column].unique():
-        column = len(df[(df[category_column] == category) & (df[value_column] == value)])
-        column_totals.append(column)
-
-    grand_total = sum(row_totals)
+    if stats is None:
+        # Every group and category of the dataframe is part of the table, also when none of its rows has the value.
+        # Missing groups and categories (code -1) are dropped by the reindex.
+        group_codes, groups = pd.factorize(df[group_column])
+        category_codes, categories = pd.factorize(df[category_column])
+        has_value = (df[value_column] == value).to_numpy()
+        table = contingency_table(row_values=group_codes[has_value], column_values=category_codes[has_value])
+        table = table.reindex(index=range(len(groups)), columns=range(len(categories)), fill_value=0).to_numpy()
+    elif isinstance(stats, ContingencyStats):
+        table = stats.table.to_numpy()
+    else:
+        table = np.asarray(stats)
 
-    frequencies = []
-    cell_values = []
-    for g, group in enumerate(df[group_column].unique(), start=0):
-        for c, category in enumerate(df[category_column].unique(), start=0):
-            value_n = len(df[(df[group_column] == group) & (df[category_column] == category) & (df[value_column] == value)])
-            cell_values.append(value_n)
-            freq_n = row_totals[g] * column_totals[c] / grand_total
-            frequencies.append(freq_n)
+    row_totals = table.sum(axis=1)
+    column_totals = table.sum(axis=0)
+    frequencies = np.outer(row_totals, column_totals) / table.sum()
 
-    n_categories = len(df[group_column].unique())
-    n_groups = len(df[category_column].unique())
+    n_categories = table.shape[0]
+    n_groups = table.shape[1]
 
-    p_value = chi_square_independence_test(frequencies=frequencies, cell_values=cell_values, n_categories=n_categories, n_groups=n_groups)
+    p_value = chi_square_independence_test(frequencies=frequencies, cell_values=table, n_categories=n_categories,
+                                           n_groups=n_groups)
 
     return p_value
 
@@ -669,19 +812,27 @@ def chi_square_goodness_of_fit_test(expected_values, observed_values):
     return p_value
 
 
-def chi_square_goodness_of_fit_test_for_df(df, category_column, expected_values):
+def chi_square_goodness_of_fit_test_for_df(df, category_column, expected_values, stats=None, group_index=None):
     """
     Calculates the p-value for a Chi-square goodness of fit test for a given point from a dataframe column.
     H0: the observed frequencies of each value in the category_column in the dataframe df are not significantly
     different from the expected frequencies expected_values
 
-    :param df: pandas.DataFrame, The dataframe containing the data
+    :param df: pandas.DataFrame, The dataframe containing the data. Not used when stats is given.
     :param category_column: str, The column in the dataframe to perform the test on
     :param expected_values: dict, The expected frequencies
+    :param stats: ContingencyStats, optional, Counts of the categories of category_column
+    :param group_index: GroupIndex, optional, The index of category_column in df. Built here when not given, so the
+    column is scanned once for all categories.
     :return: float, The calculated p-value
     """
 
-    observed_values = {key: len(df[df[category_column] == key]) for key in expected_values}
+    if stats is not None:
+        observed_values = {key: stats.count(key) for key in expected_values}
+    else:
+        if group_index is None:
+            group_index = GroupIndex.from_df(df, category_column)
+        observed_values = {key: group_index.count(key) for key in expected_values}
     p_value = chi_square_goodness_of_fit_test(expected_values=expected_values, observed_values=observed_values)
 
     return p_value
@@ -0,0 +1,245 @@
+from dateutil.relativedelta import relativedelta
+import pandas as pd
+from . import subscriptions as sb
+from .revenue import timespan_to_relativedelta
+
+
+def read_parquet_chunks(path, columns=None):
+    """
+    Reads a Parquet file one row group at a time.
+
+    :param path: str, The path to the Parquet file
+    :param columns: list, optional, The columns to read. Defaults to all columns.
+    :return: iterator of pandas.DataFrame, One DataFrame per row group
+    """
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for row_group in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(row_group, columns=columns).to_pandas()
+
+
+def churn_partials(df, user_id, plan_duration, date_column, date_split=None, timespan='whole'):
+    """
+    Calculates the mergeable partial aggregates of the churn rate for one chunk of subscription data.
+
+    :param df: pandas.DataFrame, One chunk of the subscription data
+    :param user_id: str, The column name in the chunk that represents unique user identifiers
+    :param plan_duration: str, The column name in the chunk that represents the plan duration in format 'x months'
+    :param date_column: str, The column name in the chunk that represents the payment dates
+    :param date_split: (optional) The date from which the churn is measured, required unless timespan is 'whole'
+    :param timespan: (optional) The timespan in format 'x days', 'x months', 'x years', or 'whole'.
+    :return: dict, The partial aggregates of the chunk
+    """
+
+    payment_dates = pd.to_datetime(df[date_column])
+    last_days = sb.last_day(df=df, date_column=date_column, plan_duration=plan_duration)
+
+    if timespan == 'whole':
+        user_last_day = last_days.groupby(df[user_id].to_numpy()).max()
+        partials = {'user_last_day': user_last_day.to_dict(), 'latest_payment': payment_dates.max()}
+    else:
+        end_date = date_split + timespan_to_relativedelta(timespan)
+        start_mask = (payment_dates < date_split) & (last_days >= date_split)
+        end_mask = (payment_dates < end_date) & (last_days >= end_date)
+        partials = {'start_users': set(df.loc[start_mask, user_id].unique()),
+                    'end_users': set(df.loc[end_mask, user_id].unique())}
+
+    return partials
+
+
+def merge_churn_partials(left, right):
+    """
+    Merges two sets of churn rate partial aggregates, e.g. from two chunks, partitions or days.
+
+    :param left: dict, Partial aggregates from churn_partials, updated in place
+    :param right: dict, Partial aggregates from churn_partials
+    :return: dict, The merged partial aggregates
+    """
+
+    if 'user_last_day' in left:
+        user_last_day = left['user_last_day']
+        for user, last_day in right['user_last_day'].items():
+            previous_last_day = user_last_day.get(user)
+            if previous_last_day is None or pd.isna(previous_last_day) or last_day > previous_last_day:
+                user_last_day[user] = last_day
+        if pd.isna(left['latest_payment']) or right['latest_payment'] > left['latest_payment']:
+            left['latest_payment'] = right['latest_payment']
+    else:
+        left['start_users'] |= right['start_users']
+        left['end_users'] |= right['end_users']
+
+    return left
+
+
+def churn_rate_from_partials(partials):
+    """
+    Calculates the churn rate from merged partial aggregates, as churn_rate_calculation does.
+
+    :param partials: dict, Merged partial aggregates from churn_partials
+    :return: calculated churn rate.
+    """
+
+    if 'user_last_day' in partials:
+        total_customers = len(partials['user_last_day'])
+        latest_subscription = partials['latest_payment'] - relativedelta(days=1)
+        not_churned_customers = sum(1 for last_day in partials['user_last_day'].values()
+                                    if last_day > latest_subscription)
+        churned_customers = total_customers - not_churned_customers
+        churn_rate = round((churned_customers / total_customers) * 100, 2)
+    else:
+        customers_before = len(partials['start_users'])
+        not_churned_customers = len(partials['start_users'] & partials['end_users'])
+        churned_customers = customers_before - not_churned_customers
+        if customers_before > 0:
+            churn_rate = round(((churned_customers / customers_before) * 100), 2)
+        else:
+            churn_rate = 0
+
+    return churn_rate
+
+
+def arpu_partials(df, revenue, user_id, date_split=None, date_column=None, timespan='whole'):
+    """
+    Calculates the mergeable partial aggregates of the ARPU for one chunk of subscription data.
+
+    :param df: pandas.DataFrame, One chunk of the subscription data
+    :param revenue: str, The column name in the chunk that represents the revenue
+    :param user_id: str, The column name in the chunk that represents unique user identifiers
+    :param date_split: (optional) The last day of the window, required unless timespan is 'whole'
+    :param date_column: (optional) The column name in the chunk that represents the date.
+    If not provided, the whole chunk is used.
+    :param timespan: (optional) The window length in format 'x days', 'x months', 'x years', or 'whole'.
+    :return: dict, The partial aggregates of the chunk
+    """
+
+    if date_column and timespan != 'whole':
+        start_date = date_split - timespan_to_relativedelta(timespan)
+        payment_dates = pd.to_datetime(df[date_column])
+        df = df[(payment_dates >= start_date) & (payment_dates <= date_split)]
+
+    partials = {'revenue': df[revenue].agg('sum'), 'users': set(df[user_id].unique())}
+
+    return partials
+
+
+def merge_arpu_partials(left, right):
+    """
+    Merges two sets of ARPU partial aggregates, e.g. from two chunks, partitions or days.
+
+    :param left: dict, Partial aggregates from arpu_partials, updated in place
+    :param right: dict, Partial aggregates from arpu_partials
+    :return: dict, The merged partial aggregates
+    """
+
+    left['revenue'] += right['revenue']
+    left['users'] |= right['users']
+
+    return left
+
+
+def arpu_from_partials(partials):
+    """
+    Calculates the ARPU from merged partial aggregates, as arpu_calculation does.
+
+    :param partials: dict, Merged partial aggregates from arpu_partials
+    :return: calculated ARPU.
+    """
+
+    arpu = partials['revenue'] / len(partials['users'])
+
+    return arpu
+
+
+def churn_rate_from_chunks(chunks, user_id, plan_duration, date_column, date_split=None, timespan='whole'):
+    """
+    This function calculates the churn rate from an iterator of DataFrame chunks, such as
+    pd.read_csv(..., chunksize=...) or read_parquet_chunks(...), keeping only the partial aggregates in memory.
+    Gives the same result as churn_rate_calculation on the concatenated chunks.
+
+    :param chunks: iterable of pandas.DataFrame, The chunks of the subscription data
+    :param user_id: The column name in the chunks that represents unique user identifiers.
+    :param plan_duration: The column name in the chunks that represents the plan duration in format 'x months'.
+    :param date_column: The column name in the chunks that represents the payment dates.
+    :param date_split: (optional) The date from which the churn is measured, required unless timespan is 'whole'.
+    :param timespan: (optional) The timespan in format 'x days', 'x months', 'x years', or 'whole'.
+    The default is 'whole'.
+    :return: calculated churn rate.
+    """
+
+    partials = None
+    for chunk in chunks:
+        chunk_partials = churn_partials(df=chunk, user_id=user_id, plan_duration=plan_duration,
+                                        date_column=date_column, date_split=date_split, timespan=timespan)
+        partials = chunk_partials if partials is None else merge_churn_partials(partials, chunk_partials)
+    if partials is None:
+        raise ValueError("no chunks")
+
+    churn_rate = churn_rate_from_partials(partials)
+
+    return churn_rate
+
+
+def arpu_from_chunks(chunks, revenue, user_id, date_split=None, date_column=None, timespan='whole'):
+    """
+    This function calculates the ARPU from an iterator of DataFrame chunks, such as
+    pd.read_csv(..., chunksize=...) or read_parquet_chunks(...), keeping only the partial aggregates in memory.
+    Gives the same result as arpu_calculation on the concatenated chunks.
+
+    :param chunks: iterable of pandas.DataFrame, The chunks of the subscription data
+    :param revenue: The column name in the chunks that represents the revenue.
+    :param user_id: The column name in the chunks that represents unique user identifiers.
+    :param date_split: (optional) The last day of the window, required unless timespan is 'whole'.
+    :param date_column: (optional) The column name in the chunks that represents the date.
+    If not provided, the function will use the entire data.
+    :param timespan: (optional) The window length in format 'x days', 'x months', 'x years', or 'whole'.
+    The default is 'whole'.
+    :return: calculated ARPU.
+    """
+
+    partials = None
+    for chunk in chunks:
+        chunk_partials = arpu_partials(df=chunk, revenue=revenue, user_id=user_id, date_split=date_split,
+                                       date_column=date_column, timespan=timespan)
+        partials = chunk_partials if partials is None else merge_arpu_partials(partials, chunk_partials)
+    if partials is None:
+        raise ValueError("no chunks")
+
+    arpu = arpu_from_partials(partials)
+
+    return arpu
+
+
+def ltv_from_chunks(chunks, revenue, plan_duration, user_id, date_column, timespan='whole', date_split=None):
+    """
+    This function calculates the LTV from an iterator of DataFrame chunks in a single pass,
+    collecting the churn rate and ARPU partial aggregates together.
+    Gives the same result as ltv_calculation on the concatenated chunks.
+
+    :param chunks: iterable of pandas.DataFrame, The chunks of the subscription data
+    :param revenue: The column name in the chunks that represents the revenue.
+    :param plan_duration: The column name in the chunks that represents the plan duration in format 'x months'.
+    :param user_id: The column name in the chunks that represents unique user identifiers.
+    :param date_column: The column name in the chunks that represents the payment dates.
+    :param timespan: (optional) The timespan in format 'x days', 'x months', 'x years', or 'whole'.
+    The default is 'whole'.
+    :param date_split: (optional) The split date, required unless timespan is 'whole'.
+    :return: calculated LTV.
+    """
+
+    churn = None
+    arpu = None
+    for chunk in chunks:
+        chunk_churn = churn_partials(df=chunk, user_id=user_id, plan_duration=plan_duration,
+                                     date_column=date_column, date_split=date_split, timespan=timespan)
+        chunk_arpu = arpu_partials(df=chunk, revenue=revenue, user_id=user_id, date_split=date_split,
+                                   date_column=date_column, timespan=timespan)
+        churn = chunk_churn if churn is None else merge_churn_partials(churn, chunk_churn)
+        arpu = chunk_arpu if arpu is None else merge_arpu_partials(arpu, chunk_arpu)
+    if arpu is None:
+        raise ValueError("no chunks")
+
+    ltv = arpu_from_partials(arpu) / (churn_rate_from_partials(churn) * 0.01)
+
+    return ltv
@@ -0,0 +1,271 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+def plan_duration_months(plan_duration):
+    """
+    Parses a plan duration column in format 'x months' into the number of months.
+    Every distinct label is parsed only once, the result is mapped back onto the rows through integer codes.
+    Missing or unparseable plan durations raise a ValueError.
+
+    :param plan_duration: pandas.Series, The plan durations in format 'x months' ('1 Month', '6 Months', ...)
+    :return: pandas.Series of int8, The number of months of every plan, with the same index as plan_duration
+    """
+
+    codes, labels = pd.factorize(plan_duration)
+    if (codes < 0).any():
+        raise ValueError(f"plan duration is missing for {int((codes < 0).sum())} rows")
+
+    months_by_label = []
+    invalid_labels = []
+    for label in labels:
+        try:
+            months_by_label.append(int(str(label).split(" ")[0]))
+        except ValueError:
+            invalid_labels.append(label)
+    if invalid_labels:
+        raise ValueError(f"plan durations must be in format 'x months', got {invalid_labels}")
+    months = np.array(months_by_label, dtype=np.int8)[codes]
+
+    return pd.Series(months, index=plan_duration.index, name=plan_duration.name)
+
+
+def add_months(dates, months):
+    """
+    Adds a number of months to every date, clamping the day to the end of the resulting month.
+    Gives the same result as adding dateutil's relativedelta(months=x) row by row: 2023-01-31 + 1 month is 2023-02-28.
+
+    :param dates: array-like of datetime64, The dates to shift
+    :param months: int or array-like of int, The number of months to add to each date
+    :return: numpy.ndarray of datetime64[ns], The shifted dates
+    """
+
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    months = np.asarray(months, dtype=np.int64)
+
+    days = dates.astype('datetime64[D]')
+    time_of_day = dates - days
+    month_start = dates.astype('datetime64[M]')
+    day_of_month = days - month_start.astype('datetime64[D]')
+
+    new_month_start = month_start + months
+    new_month_length = (new_month_start + 1).astype('datetime64[D]') - new_month_start.astype('datetime64[D]')
+    new_day_of_month = np.minimum(day_of_month, new_month_length - np.timedelta64(1, 'D'))
+
+    shifted = new_month_start.astype('datetime64[D]') + new_day_of_month + time_of_day
+
+    return shifted.astype('datetime64[ns]')
+
+
+def last_day(df, date_column, plan_duration):
+    """
+    Calculates the last day of every subscription period: the payment date shifted by the plan duration.
+
+    :param df: pandas.DataFrame, The dataframe containing the subscription data
+    :param date_column: str, The column in the dataframe that represents the payment dates
+    :param plan_duration: str, The column in the dataframe that represents the plan duration in format 'x months'
+    :return: pandas.Series of datetime64[ns], The last day of every subscription period
+    """
+
+    months = plan_duration_months(df[plan_duration])
+    last_days = add_months(pd.to_datetime(df[date_column]), months)
+
+    return pd.Series(last_days, index=df.index, name='Last Day')
+
+
+class SubscriptionFrame:
+    """
+    Compact column store of the payments the revenue functions read, built once from a DataFrame.
+    Users are kept as integer codes, plan durations as int8 months, payment dates as datetime64[ns] and revenue as
+    float64 (or float32) arrays. Derived arrays such as the last day of every subscription period are computed on first
+    use and kept in the object, so the source DataFrame is never written to.
+    """
+
+    def __init__(self, user_codes, user_labels, payment_dates, durations=None, revenue=None):
+        """
+        :param user_codes: numpy.ndarray of int, The code of the user of every payment, -1 for a missing user
+        :param user_labels: pandas.Index, The user id of every code
+        :param payment_dates: numpy.ndarray of datetime64[ns], The payment dates
+        :param durations: numpy.ndarray of int8, optional, The plan duration of every payment in months
+        :param revenue: numpy.ndarray of float, optional, The revenue of every payment
+        """
+
+        self.user_codes = user_codes
+        self.user_labels = user_labels
+        self.payment_dates = payment_dates
+        self.durations = durations
+        self._revenue = revenue
+        self._last_days = None
+
+    @classmethod
+    def from_df(cls, df, user_id, date_column, plan_duration=None, revenue=None, revenue_dtype=np.float64):
+        """
+        Builds the frame from the needed columns of a DataFrame.
+
+        :param df: pandas.DataFrame, The dataframe containing the subscription data
+        :param user_id: str, The column in the dataframe that represents unique user identifiers
+        :param date_column: str, The column in the dataframe that represents the payment dates
+        :param plan_duration: str, optional, The column in the dataframe that represents the plan duration
+        :param revenue: str, optional, The column in the dataframe that represents the revenue
+        :param revenue_dtype: numpy dtype, optional, np.float64 or np.float32. Defaults to np.float64.
+        :return: SubscriptionFrame
+        """
+
+        user_codes, user_labels = pd.factorize(df[user_id])
+        if len(user_labels) < np.iinfo(np.int32).max:
+            user_codes = user_codes.astype(np.int32)
+        payment_dates = pd.to_datetime(df[date_column]).to_numpy(dtype='datetime64[ns]')
+
+        durations = None
+        if plan_duration is not None:
+            durations = plan_duration_months(df[plan_duration]).to_numpy()
+
+        revenues = None
+        if revenue is not None:
+            revenues = df[revenue].to_numpy(dtype=revenue_dtype, na_value=np.nan)
+
+        return cls(user_codes=user_codes, user_labels=user_labels, payment_dates=payment_dates, durations=durations,
+                   revenue=revenues)
+
+    def __len__(self):
+        return len(self.payment_dates)
+
+    @property
+    def revenue(self):
+        """
+        The revenue of every payment. Raises a ValueError when the frame was built without a revenue column.
+        """
+
+        if self._revenue is None:
+            raise ValueError("SubscriptionFrame was built without a revenue column")
+        return self._revenue
+
+    @property
+    def last_days(self):
+        """
+        The last day of the subscription period of every payment, computed on first access.
+        Raises a ValueError when the frame was built without a plan duration column.
+        """
+
+        if self._last_days is None:
+            if self.durations is None:
+                raise ValueError("SubscriptionFrame was built without a plan duration column")
+            self._last_days = add_months(self.payment_dates, self.durations)
+        return self._last_days
+
+    def fingerprint(self):
+        """
+        Calculates a content fingerprint of the frame.
+
+        :return: str, The fingerprint, equal for frames with the same content
+        """
+
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (self.user_codes, self.payment_dates, self.durations, self._revenue):
+            if array is not None:
+                digest.update(np.ascontiguousarray(array).tobytes())
+            digest.update(b'|')
+        digest.update(pd.util.hash_pandas_object(pd.Series(self.user_labels), index=False).to_numpy().tobytes())
+
+        return digest.hexdigest()
+
+
+class ActiveSubscriberIndex:
+    """
+    Answers which users are active at a date, built once over the subscription intervals (Payment Date, Last Day].
+    A user is active at date t when one of their payments satisfies Payment Date < t <= Last Day, the same rule the
+    churn rate functions use.
+
+    Overlapping intervals of a user are merged, so active-user counts are two binary searches over the sorted merged
+    starts and ends. Active-user sets search the raw intervals sorted by start: only the ones starting within the
+    longest single interval before the date can contain it.
+    """
+
+    def __init__(self, user_ids, payment_dates, last_days):
+        """
+        :param user_ids: array-like, The user of every payment
+        :param payment_dates: array-like of datetime64, The payment dates
+        :param last_days: array-like of datetime64, The last day of the subscription period of every payment
+        """
+
+        user_codes, self.user_labels = pd.factorize(pd.Series(user_ids))
+        starts = np.asarray(payment_dates, dtype='datetime64[ns]')
+        ends = np.asarray(last_days, dtype='datetime64[ns]')
+        valid = (user_codes >= 0) & ~np.isnat(starts) & ~np.isnat(ends) & (ends > starts)
+        user_codes = user_codes[valid]
+        starts = starts[valid]
+        ends = ends[valid]
+
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.user_codes = user_codes[order]
+        if len(starts):
+            self.longest_interval = (ends - starts).max()
+        else:
+            self.longest_interval = np.timedelta64(0, 'ns')
+
+        order = np.lexsort((starts, user_codes))
+        user_codes = user_codes[order]
+        starts = starts[order]
+        ends = ends[order]
+        running_end = pd.Series(ends).groupby(user_codes).cummax().to_numpy(dtype='datetime64[ns]')
+        new_user = np.ones(len(user_codes), dtype=bool)
+        new_user[1:] = user_codes[1:] != user_codes[:-1]
+        opens_interval = new_user.copy()
+        opens_interval[1:] |= starts[1:] > running_end[:-1]
+        closes_interval = np.ones(len(user_codes), dtype=bool)
+        closes_interval[:-1] = opens_interval[1:]
+
+        self.merged_starts = np.sort(starts[opens_interval])
+        self.merged_ends = np.sort(running_end[closes_interval])
+
+    @classmethod
+    def from_df(cls, df, user_id, plan_duration, date_column):
+        """
+        Builds the index from a dataframe of payments.
+
+        :param df: pandas.DataFrame, The dataframe containing the subscription data
+        :param user_id: str, The column in the dataframe that represents unique user identifiers
+        :param plan_duration: str, The column in the dataframe that represents the plan duration in format 'x months'
+        :param date_column: str, The column in the dataframe that represents the payment dates
+        :return: ActiveSubscriberIndex
+        """
+
+        return cls(user_ids=df[user_id], payment_dates=pd.to_datetime(df[date_column]),
+                   last_days=last_day(df=df, date_column=date_column, plan_duration=plan_duration))
+
+    def active_count(self, dates):
+        """
+        Counts the users active at every date.
+
+        :param dates: date or array-like of dates
+        :return: int or numpy.ndarray of int, The number of active users at every date
+        """
+
+        query = np.asarray(pd.to_datetime(dates), dtype='datetime64[ns]')
+        counts = (np.searchsorted(self.merged_starts, query, side='left') -
+                  np.searchsorted(self.merged_ends, query, side='left'))
+
+        return counts[()] if counts.ndim == 0 else counts
+
+    def active_users(self, dates):
+        """
+        Lists the users active at every date.
+
+        :param dates: date or array-like of dates
+        :return: numpy.ndarray of user ids, or a list of them when dates is array-like
+        """
+
+        query = np.asarray(pd.to_datetime(dates), dtype='datetime64[ns]')
+        first = np.searchsorted(self.starts, query - self.longest_interval, side='left')
+        last = np.searchsorted(self.starts, query, side='left')
+
+        users = []
+        for date, first_interval, last_interval in zip(query.ravel(), first.ravel(), last.ravel()):
+            candidates = slice(first_interval, last_interval)
+            active_codes = np.unique(self.user_codes[candidates][self.ends[candidates] >= date])
+            users.append(np.asarray(self.user_labels[active_codes]))
+
+        return users[0] if query.ndim == 0 else users
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+
+def group_sufficient_statistics(df, category_column, numerical_column, group_of_interest=None, center=0.0):
+    """
+    Calculates the count, sum and sum of squares of a numerical column for every group, and the sum of squared
+    deviations from the group mean (m2), which is taken about the group mean itself so it does not lose precision
+    to cancellation as sum_of_squares - sum^2 / count does.
+
+    :param df: pandas.DataFrame, The dataframe containing the data
+    :param category_column: str or list, The column in the dataframe to group by, or a list of columns to group by
+    their combinations of levels
+    :param numerical_column: str, The column in the dataframe to summarize
+    :param group_of_interest: list, optional, The groups to keep, when grouping by a single column. Defaults to all
+    groups.
+    :param center: float, optional, A value subtracted from every observation before summing, for numerical stability.
+    Defaults to 0.
+    :return: pandas.DataFrame, indexed by group (a MultiIndex for several columns), with columns 'count', 'sum',
+    'sum_of_squares' and 'm2'
+    """
+
+    if group_of_interest is not None:
+        df = df[df[category_column].isin(group_of_interest)]
+
+    keys = list(category_column) if isinstance(category_column, (list, tuple)) else [category_column]
+    values = df[numerical_column] - center
+    frame = df[keys].copy()
+    frame['__value'] = values
+    frame['__square'] = values ** 2
+    grouped = frame.groupby(keys if len(keys) > 1 else keys[0], sort=False)
+    frame['__deviation'] = (values - grouped['__value'].transform('mean')) ** 2
+    group_stats = grouped.agg(count=('__value', 'count'), sum=('__value', 'sum'), sum_of_squares=('__square', 'sum'),
+                              m2=('__deviation', 'sum'))
+
+    return group_stats
+
+
+def squares_about_mean(table):
+    """
+    Gives the sum of squared deviations from the mean of every group of a table of sufficient statistics: its m2
+    column when it has one, else sum_of_squares - sum^2 / count, clipped at 0 against cancellation.
+
+    :param table: pandas.DataFrame, with columns 'count', 'sum', 'sum_of_squares' and optionally 'm2'
+    :return: pandas.Series, The sum of squared deviations of every group
+    """
+
+    if 'm2' in table:
+        return table['m2'].clip(lower=0)
+
+    return (table['sum_of_squares'] - (table['sum'] ** 2) / table['count']).clip(lower=0)
+
+
+class GroupStats:
+    """
+    Sufficient statistics of a numerical variable per group: the number of observations, their sum, their sum of
+    squares and their sum of squared deviations from the group mean (m2). Statistics of partitions, chunks or days of
+    the same data merge into the statistics of the whole data, m2 with Chan's parallel formula, and the means,
+    standard deviations and sums of squares the parametric tests need are derived from them.
+    """
+
+    def __init__(self, table):
+        """
+        :param table: pandas.DataFrame, indexed by group, with columns 'count', 'sum', 'sum_of_squares' and optionally
+        'm2'. Without m2, it is derived from the other columns.
+        """
+
+        table = table.copy()
+        if 'm2' not in table:
+            table['m2'] = squares_about_mean(table)
+        self.table = table[['count', 'sum', 'sum_of_squares', 'm2']]
+
+    @classmethod
+    def from_df(cls, df, category_column, numerical_column):
+        """
+        Builds the statistics of a numerical column per group of a categorical column.
+
+        :param df: pandas.DataFrame, The dataframe containing the data
+        :param category_column: str, The column in the dataframe to group by
+        :param numerical_column: str, The column in the dataframe to summarize
+        :return: GroupStats
+        """
+
+        return cls(group_sufficient_statistics(df=df, category_column=category_column,
+                                               numerical_column=numerical_column))
+
+    @classmethod
+    def from_array(cls, values, labels=None):
+        """
+        Builds the statistics of an array of observations, as one group or grouped by labels.
+
+        :param values: array-like, The observations
+        :param labels: array-like, optional, The group of every observation. Defaults to a single group named 'all'.
+        :return: GroupStats
+        """
+
+        values = pd.Series(np.asarray(values, dtype=np.float64))
+        if labels is None:
+            labels = np.full(len(values), 'all', dtype=object)
+        df = pd.DataFrame({'group': np.asarray(labels), 'value': values})
+
+        return cls.from_df(df=df, category_column='group', numerical_column='value')
+
+    @classmethod
+    def from_chunks(cls, chunks, category_column, numerical_column):
+        """
+        Builds the statistics from an iterator of dataframe chunks, such as pd.read_csv(..., chunksize=...).
+
+        :param chunks: iterable of pandas.DataFrame, The chunks of the data
+        :param category_column: str, The column in the chunks to group by
+        :param numerical_column: str, The column in the chunks to summarize
+        :return: GroupStats
+        """
+
+        group_stats = None
+        for chunk in chunks:
+            chunk_stats = cls.from_df(df=chunk, category_column=category_column, numerical_column=numerical_column)
+            group_stats = chunk_stats if group_stats is None else group_stats.merge(chunk_stats)
+
+        return group_stats
+
+    def merge(self, other):
+        """
+        Combines these statistics with the statistics of another partition of the same data.
+
+        :param other: GroupStats, The statistics to add
+        :return: GroupStats, The statistics of both partitions together
+        """
+
+        left, right = self.table.align(other.table, join='outer', fill_value=0)
+        table = left + right
+        table['count'] = table['count'].astype(np.int64)
+        delta = right['sum'] / right['count'] - left['sum'] / left['count']
+        table['m2'] = left['m2'] + right['m2'] + (delta ** 2 * left['count'] * right['count'] / table['count']).fillna(0)
+
+        return GroupStats(table)
+
+    def total(self):
+        """
+        Pools all groups into one.
+
+        :return: GroupStats, with a single group named 'all'
+        """
+
+        table = self.table.sum().to_frame('all').T
+        grand_mean = table['sum'].iloc[0] / table['count'].iloc[0]
+        table['m2'] = self.table['m2'].sum() + (self.table['count'] * (self.mean - grand_mean) ** 2).sum()
+
+        return GroupStats(table)
+
+    def select(self, groups):
+        """
+        Keeps only the given groups.
+
+        :param groups: list, The groups to keep
+        :return: GroupStats
+        """
+
+        return GroupStats(self.table[self.table.index.isin(groups)])
+
+    @property
+    def count(self):
+        return self.table['count']
+
+    @property
+    def mean(self):
+        return self.table['sum'] / self.table['count']
+
+    @property
+    def variance(self):
+        """
+        The sample variance (ddof=1) of every group.
+        """
+
+        return self.table['m2'] / (self.table['count'] - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def describe(self, group):
+        """
+        Gives the mean, standard deviation and size of one group.
+
+        :param group: The group to describe
+        :return: tuple, (mean, std, n) of the group
+        """
+
+        return self.mean[group], self.std[group], int(self.count[group])
+
+
+class ContingencyStats:
+    """
+    Counts of observations per category, or per pair of categories of two columns.
+    Counts of partitions, chunks or days of the same data merge into the counts of the whole data, and the
+    proportion and chi-square tests run from them.
+    """
+
+    def __init__(self, table):
+        """
+        :param table: pandas.DataFrame, The counts, indexed by the row categories, with the column categories as
+        columns. One-way counts have a single column named 'count'.
+        """
+
+        self.table = table
+
+    @classmethod
+    def from_df(cls, df, row_column, column_column=None):
+        """
+        Counts the observations per category of one column, or per pair of categories of two columns.
+
+        :param df: pandas.DataFrame, The dataframe containing the data
+        :param row_column: str, The column whose categories become the rows of the table
+        :param column_column: str, optional, The column whose categories become the columns of the table
+        :return: ContingencyStats
+        """
+
+        if column_column is None:
+            table = df[row_column].value_counts(sort=False).to_frame('count')
+        else:
+            table = df.groupby([row_column, column_column], sort=False).size().unstack(fill_value=0)
+
+        return cls(table)
+
+    @classmethod
+    def from_array(cls, values, other_values=None):
+        """
+        Counts the categories of an array, or the pairs of categories of two arrays.
+
+        :param values: array-like, The categories of every observation
+        :param other_values: array-like, optional, The second categories of every observation
+        :return: ContingencyStats
+        """
+
+        df = pd.DataFrame({'row': np.asarray(values)})
+        if other_values is None:
+            return cls.from_df(df=df, row_column='row')
+        df['column'] = np.asarray(other_values)
+
+        return cls.from_df(df=df, row_column='row', column_column='column')
+
+    @classmethod
+    def from_chunks(cls, chunks, row_column, column_column=None):
+        """
+        Counts the observations from an iterator of dataframe chunks, such as pd.read_csv(..., chunksize=...).
+
+        :param chunks: iterable of pandas.DataFrame, The chunks of the data
+        :param row_column: str, The column whose categories become the rows of the table
+        :param column_column: str, optional, The column whose categories become the columns of the table
+        :return: ContingencyStats
+        """
+
+        contingency_stats = None
+        for chunk in chunks:
+            chunk_stats = cls.from_df(df=chunk, row_column=row_column, column_column=column_column)
+            contingency_stats = chunk_stats if contingency_stats is None else contingency_stats.merge(chunk_stats)
+
+        return contingency_stats
+
+    def merge(self, other):
+        """
+        Combines these counts with the counts of another partition of the same data.
+
+        :param other: ContingencyStats, The counts to add
+        :return: ContingencyStats, The counts of both partitions together
+        """
+
+        table = self.table.add(other.table, fill_value=0).fillna(0).astype(np.int64)
+
+        return ContingencyStats(table)
+
+    @property
+    def total(self):
+        return int(self.table.to_numpy().sum())
+
+    def count(self, row, column=None):
+        """
+        Gives the number of observations of a category, or of a pair of categories.
+
+        :param row: The row category
+        :param column: optional, The column category. When None, the whole row is counted.
+        :return: int, The number of observations
+        """
+
+        if row not in self.table.index:
+            return 0
+        if column is None:
+            return int(self.table.loc[row].sum())
+        if column not in self.table.columns:
+            return 0
+
+        return int(self.table.loc[row, column])
@@ -1 +1 @@
-from . import custom_corrections, duplicates, missing_values, sanity_check, set_data_types
\ No newline at end of file
+from . import custom_corrections, duplicates, missing_values, profiler, quantile_sketch, sanity_check, set_data_types
@@ -2,18 +2,86 @@ import pandas as pd
 import numpy as np
 from dateutil.relativedelta import relativedelta
 import analytics.revenue as rv
+import analytics.subscriptions as sb
+from analytics.group_index import GroupIndex
 import cleaning.duplicates as dups
 
 random_state = 1
 
 
-def mask_creation(df, column_to_filter, value_to_filter, index_to_change, percentage, column_to_change, value_to_change):
-    filtered_df = df[df[column_to_filter] == value_to_filter]
+def mask_creation(df, column_to_filter, value_to_filter, index_to_change, percentage, column_to_change, value_to_change,
+                  group_index=None):
+    if group_index is not None:
+        filtered_df = df.iloc[group_index.positions(value_to_filter)]
+    else:
+        filtered_df = df[df[column_to_filter] == value_to_filter]
     mask = filtered_df.sample(frac=(index_to_change * percentage), random_state=1).index
     df.loc[mask, column_to_change] = value_to_change
 
 
-def preliminary_dataset_corrections(df, random_state=1):
+def extend_subscriptions(extension, max_date):
+    """
+    Moves every sampled payment to the renewal date that follows the previous payment of the same user.
+    The first payment of a user is renewed from its own date and plan duration, every next one from the (renewed)
+    date and plan duration of the payment before it. A renewal is kept when it falls on or before max_date and is
+    not already a payment date of the user. Otherwise a first payment is dropped and a later one keeps its date.
+
+    The payments are laid out in a (user, rank) grid, so the renewal chain advances one rank at a time for all
+    users together instead of row by row. The 4% random plan changes are drawn from the global numpy random state
+    as the row-by-row version did after the first payment of the second user: the first user keeps its sampled
+    plans for the whole chain, the other users renew their later payments with the changed plans.
+
+    :param extension: pandas.DataFrame, The sampled payments sorted by 'User ID', with a default index
+    :param max_date: datetime, The last allowed renewal date
+    :return: tuple, (the renewed payments with the random plan changes, the index of the first payments to drop)
+    """
+
+    extension_cop = extension.copy()
+    durations = sb.plan_duration_months(extension['Plan Duration']).to_numpy(dtype=np.int64)
+    renewal_durations = durations.copy()
+
+    users = extension['User ID'].unique()
+    if len(users) > 1 and pd.notna(users[1]):
+        mask4 = np.random.rand(len(extension_cop)) < 0.04
+        extension_cop.loc[mask4, 'Plan Duration'] = np.random.choice(['1 Month', '6 Months', '12 Months'],
+                                                                     size=mask4.sum())
+        first_user = (extension['User ID'] == users[0]).to_numpy()
+        renewal_durations[~first_user] = sb.plan_duration_months(
+            extension_cop['Plan Duration']).to_numpy(dtype=np.int64)[~first_user]
+
+    user_codes, _ = pd.factorize(extension['User ID'])
+    has_user = user_codes >= 0
+    rows = np.flatnonzero(has_user)
+    user_codes = user_codes[has_user]
+    ranks = extension.loc[has_user].groupby('User ID', sort=False).cumcount().to_numpy()
+
+    n_users = user_codes.max() + 1 if len(user_codes) else 0
+    n_ranks = ranks.max() + 1 if len(ranks) else 0
+    dates = np.full((n_users, n_ranks), np.datetime64('NaT'), dtype='datetime64[ns]')
+    dates[user_codes, ranks] = extension['Payment Date'].to_numpy(dtype='datetime64[ns]')[rows]
+    grid_durations = np.zeros((n_users, n_ranks), dtype=np.int64)
+    grid_durations[user_codes, ranks] = renewal_durations[rows]
+    max_date = np.datetime64(pd.Timestamp(max_date), 'ns')
+
+    indices_to_drop = []
+    for r in range(n_ranks):
+        at_rank = np.flatnonzero(ranks == r)
+        grid_users = user_codes[at_rank]
+        if r == 0:
+            new_dates = sb.add_months(dates[grid_users, 0], durations[rows[at_rank]])
+        else:
+            new_dates = sb.add_months(dates[grid_users, r - 1], grid_durations[grid_users, r - 1])
+        renewed = (new_dates <= max_date) & ~(dates[grid_users] == new_dates[:, None]).any(axis=1)
+        dates[grid_users[renewed], r] = new_dates[renewed]
+        if r == 0:
+            indices_to_drop = list(extension.index[rows[at_rank[~renewed]]])
+
+    extension_cop.loc[extension_cop.index[rows], 'Payment Date'] = dates[user_codes, ranks]
+
+    return extension_cop, indices_to_drop
+
+
+def preliminary_dataset_corrections(df, random_state=1, extension_size=8000):
 
     df['Last Payment Date'] = pd.to_datetime(df['Last Payment Date'])
     df['Join Date'] = pd.to_datetime(df['Join Date'])
@@ -41,6 +109,9 @@ def preliminary_dataset_corrections(df, random_state=1):
     device_order = ['SmartTV', 'Laptop', 'Tablet', 'Smartphone']
     country_order = ['United States', 'United Kingdom', 'Canada', 'Australia', 'France', 'Mexico', 'Germany', 'Italy',
                      'Spain', 'Mexico']
+    # Device and Country are not changed below, so their rows are looked up once for all the masks
+    device_index = GroupIndex.from_df(df, 'Device')
+    country_index = GroupIndex.from_df(df, 'Country')
 
     for d, device in enumerate(device_order, start=1):
         mask_creation(df=df,
@@ -49,14 +120,16 @@ def preliminary_dataset_corrections(df, random_state=1):
                       index_to_change=d,
                       percentage=0.018,
                       column_to_change='Plan Duration',
-                      value_to_change='6 Month')
+                      value_to_change='6 Month',
+                      group_index=device_index)
         mask_creation(df=df,
                       column_to_filter='Device',
                       value_to_filter=device,
                       index_to_change=d,
                       percentage=0.04,
                       column_to_change='Subscription Type',
-                      value_to_change='Basic')
+                      value_to_change='Basic',
+                      group_index=device_index)
 
     for d, device in enumerate(reversed(device_order), start=0):
         mask_creation(
@@ -66,7 +139,8 @@ def preliminary_dataset_corrections(df, random_state=1):
             index_to_change=d,
             percentage=0.12**d,
             column_to_change='Plan Duration',
-            value_to_change='12 Month'
+            value_to_change='12 Month',
+            group_index=device_index
         )
 
     for c, country in enumerate((country_order), start=1):
@@ -76,49 +150,27 @@ def preliminary_dataset_corrections(df, random_state=1):
                       index_to_change=c,
                       percentage=0.15**c,
                       column_to_change='Subscription Type',
-                      value_to_change='Premium')
+                      value_to_change='Premium',
+                      group_index=country_index)
         mask_creation(df=df,
                       column_to_filter='Country',
                       value_to_filter=country,
                       index_to_change=c,
                       percentage=0.15**c,
                       column_to_change='Plan Duration',
-                      value_to_change='12 Months')
+                      value_to_change='12 Months',
+                      group_index=country_index)
 
     for c, country in enumerate(reversed(country_order), start=1):
         mask_creation(df=df, column_to_filter='Country', value_to_filter=country, index_to_change=c, percentage=0.015,
-                      column_to_change='Subscription Type', value_to_change='Basic')
+                      column_to_change='Subscription Type', value_to_change='Basic', group_index=country_index)
         mask_creation(df=df, column_to_filter='Country', value_to_filter=country, index_to_change=c,
-                      percentage=0.01, column_to_change='Plan Duration', value_to_change='1 Month')
+                      percentage=0.01, column_to_change='Plan Duration', value_to_change='1 Month',
+                      group_index=country_index)
 
-    extension = df.sample(n=8000, replace=True, random_state=random_state).sort_values("User ID").reset_index(drop=True)
-    extension_cop = extension.copy()
+    extension = df.sample(n=extension_size, replace=True, random_state=random_state).sort_values("User ID").reset_index(drop=True)
     max_date = df['Payment Date'].max() + relativedelta(days=24)
-    indices_to_drop = []
-
-    for u, user in enumerate(extension['User ID'].unique()):
-        sorting = extension[extension['User ID'] == user]
-        for r, (index, row) in enumerate(sorting.iterrows()):
-            sorting_new = extension_cop[extension_cop['User ID'] == user]
-            if r == 0:
-                duration = int(row['Plan Duration'].split(" ")[0])
-                new_date = row['Payment Date'] + relativedelta(months=duration)
-                if new_date <= max_date and new_date not in sorting_new['Payment Date'].values:
-                    extension_cop.at[sorting_new.index[r], 'Payment Date'] = new_date
-                    sorting_new.at[sorting_new.index[r], 'Payment Date'] = new_date
-                else:
-                    indices_to_drop.append(sorting_new.index[r])
-                if u == 1:
-                    mask4 = np.random.rand(len(extension_cop)) < 0.04
-                    extension_cop.loc[mask4, 'Plan Duration'] = np.random.choice(['1 Month', '6 Months', '12 Months'],
-                                                                                 size=mask4.sum())
-            else:
-                previous_row = sorting_new.iloc[(r - 1)]
-                duration = int(previous_row['Plan Duration'].split(" ")[0])
-                new_date = previous_row['Payment Date'] + relativedelta(months=duration)
-                if new_date <= max_date and new_date not in sorting_new['Payment Date'].values:
-                    extension_cop.at[sorting_new.index[r], 'Payment Date'] = new_date
-                    sorting_new.at[sorting_new.index[r], 'Payment Date'] = new_date
+    extension_cop, indices_to_drop = extend_subscriptions(extension=extension, max_date=max_date)
 
     extension_cop = extension_cop.drop(indices_to_drop)
 
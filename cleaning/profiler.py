@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+
+def column_kind(series):
+    """
+    Classifies a column for the sanity checks.
+
+    :param series: pandas.Series, The column
+    :return: str, 'numerical', 'date' or 'categorical'
+    """
+
+    if pd.api.types.is_bool_dtype(series):
+        return 'categorical'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numerical'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'date'
+    return 'categorical'
+
+
+def profile_columns(df, outlier_factor=1.5, max_categories=25):
+    """
+    Profiles all columns of a dataframe without any interaction: types, missing values, cardinalities, quantiles,
+    IQR outliers and date ranges. Every statistic is computed once for all columns of its kind.
+
+    :param df: pandas.DataFrame, The dataframe to profile
+    :param outlier_factor: float, optional, The multiple of the IQR beyond the quartiles from which a value is an
+    outlier. Defaults to 1.5.
+    :param max_categories: int, optional, The largest cardinality for which the counts of a categorical column are
+    kept. Defaults to 25.
+    :return: dict, with 'summary' (a pandas.DataFrame with a row per column), 'outliers' (a boolean mask of the
+    outlier rows per numerical column) and 'value_counts' (the counts of every categorical column with at most
+    max_categories values)
+    """
+
+    kinds = {column: column_kind(df[column]) for column in df.columns}
+    numerical = [column for column, kind in kinds.items() if kind == 'numerical']
+    dates = [column for column, kind in kinds.items() if kind == 'date']
+    categorical = [column for column, kind in kinds.items() if kind == 'categorical']
+
+    summary = pd.DataFrame({'Column': df.columns, 'Kind': [kinds[column] for column in df.columns],
+                            'Type': [str(dtype) for dtype in df.dtypes], 'Nulls': df.isna().sum().to_numpy(),
+                            'Unique': df.nunique().to_numpy()}).set_index('Column', drop=False)
+    for statistic in ['Min', 'Q1', 'Median', 'Q3', 'Max', 'Outliers']:
+        summary[statistic] = pd.Series(dtype=object)
+
+    outliers = {}
+    if numerical:
+        quantiles = df[numerical].quantile([0.25, 0.5, 0.75])
+        minimums = df[numerical].min()
+        maximums = df[numerical].max()
+        iqr = quantiles.loc[0.75] - quantiles.loc[0.25]
+        lower_outliers = quantiles.loc[0.25] - iqr * outlier_factor
+        upper_outliers = quantiles.loc[0.75] + iqr * outlier_factor
+        for column in numerical:
+            outliers[column] = (df[column] < lower_outliers[column]) | (df[column] > upper_outliers[column])
+            summary.loc[column, ['Min', 'Q1', 'Median', 'Q3', 'Max', 'Outliers']] = [
+                minimums[column], quantiles.loc[0.25, column], quantiles.loc[0.5, column],
+                quantiles.loc[0.75, column], maximums[column], int(outliers[column].sum())]
+
+    if dates:
+        minimums = df[dates].min()
+        maximums = df[dates].max()
+        for column in dates:
+            summary.loc[column, ['Min', 'Max']] = [minimums[column], maximums[column]]
+
+    value_counts = {column: df[column].value_counts() for column in categorical
+                    if summary.loc[column, 'Unique'] <= max_categories}
+
+    return {'summary': summary.reset_index(drop=True), 'outliers': outliers, 'value_counts': value_counts}
+
+
+def _figure_path(output_dir, column):
+    file_name = ''.join(character if character.isalnum() else '_' for character in str(column))
+    return os.path.join(output_dir, f"{file_name}.png")
+
+
+def _render_figure(path, title, draw):
+    """
+    Draws one figure and writes it to a file. Figures are created with the object API, not pyplot, so several can be
+    rendered at the same time from different threads.
+    """
+
+    fig = Figure(figsize=(6.4, 4.8))
+    ax = fig.subplots()
+    draw(ax)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path)
+
+    return path
+
+
+def render_profile_figures(df, profile, output_dir, max_workers=4):
+    """
+    Writes the figures of the sanity checks to files: a count plot of every categorical column in the profile's
+    value counts, a histogram of every numerical column and of every date column.
+
+    :param df: pandas.DataFrame, The profiled dataframe
+    :param profile: dict, The profile returned by profile_columns
+    :param output_dir: str, The directory of the figures
+    :param max_workers: int, optional, The number of figures rendered at the same time. Defaults to 4.
+    :return: dict, The path of the figure of every column
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = {}
+    for column, counts in profile['value_counts'].items():
+        jobs[column] = (f"Categorical column: {column}",
+                        lambda ax, counts=counts: ax.barh([str(label) for label in counts.index[::-1]],
+                                                          counts.to_numpy()[::-1]))
+    for row in profile['summary'].itertuples(index=False):
+        values = df[row.Column].dropna()
+        if row.Kind == 'numerical':
+            jobs[row.Column] = (f"Numerical column: {row.Column}",
+                                lambda ax, values=values: ax.hist(values.to_numpy(dtype=np.float64), bins='auto'))
+        elif row.Kind == 'date':
+            jobs[row.Column] = (f"Date column: {row.Column}", lambda ax, values=values: ax.hist(values, bins=10))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {column: executor.submit(_render_figure, _figure_path(output_dir, column), title, draw)
+                   for column, (title, draw) in jobs.items()}
+        return {column: future.result() for column, future in futures.items()}
+
+
+def profile_report(df, output_dir=None, outlier_factor=1.5, max_categories=25, max_workers=4):
+    """
+    Runs the sanity checks of a dataframe without interaction, for batch jobs: profiles all columns and, when an
+    output directory is given, writes the figures to it.
+
+    :param df: pandas.DataFrame, The dataframe to check
+    :param output_dir: str, optional, The directory of the figures. Defaults to None, no figures.
+    :param outlier_factor: float, optional, The IQR multiple of the outlier thresholds. Defaults to 1.5.
+    :param max_categories: int, optional, The largest cardinality of the categorical columns to plot. Defaults to 25.
+    :param max_workers: int, optional, The number of figures rendered at the same time. Defaults to 4.
+    :return: dict, The profile returned by profile_columns, with the figure paths under 'figures'
+    """
+
+    profile = profile_columns(df=df, outlier_factor=outlier_factor, max_categories=max_categories)
+    profile['figures'] = {}
+    if output_dir is not None:
+        profile['figures'] = render_profile_figures(df=df, profile=profile, output_dir=output_dir,
+                                                    max_workers=max_workers)
+
+    return profile
@@ -0,0 +1,233 @@
+import math
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    KLL sketch of the distribution of a stream of numbers, for approximate quantiles in bounded memory.
+    Values are kept in a stack of compactors: an item at level h stands for 2^h values. When a level is over its
+    capacity it is sorted and every other item, starting at a random offset, is promoted to the next level, which
+    halves its size while keeping ranks unbiased. The sketch keeps O(k) items whatever the number of values, is built
+    in one pass over chunks and sketches of different partitions merge into the sketch of their union.
+    The count, minimum and maximum are exact.
+    """
+
+    def __init__(self, k=200, seed=0):
+        """
+        :param k: int, optional, The capacity of the top level. The rank error falls roughly as 1/k. Defaults to 200.
+        :param seed: int, optional, The seed of the compaction offsets. Defaults to 0.
+        """
+
+        if k < 8:
+            raise ValueError("k must be at least 8")
+
+        self.k = k
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_chunks(cls, chunks, k=200, seed=0):
+        """
+        Builds the sketch of a stream of chunks of values.
+
+        :param chunks: iterable of array-like, The chunks of values
+        :param k: int, optional, The capacity of the top level. Defaults to 200.
+        :param seed: int, optional, The seed of the compaction offsets. Defaults to 0.
+        :return: QuantileSketch
+        """
+
+        sketch = cls(k=k, seed=seed)
+        for chunk in chunks:
+            sketch.update(chunk)
+
+        return sketch
+
+    @classmethod
+    def from_df(cls, df, column, k=200, seed=0):
+        """
+        Builds the sketch of a dataframe column.
+
+        :param df: pandas.DataFrame, The dataframe containing the data
+        :param column: str, The column in the dataframe to sketch
+        :param k: int, optional, The capacity of the top level. Defaults to 200.
+        :param seed: int, optional, The seed of the compaction offsets. Defaults to 0.
+        :return: QuantileSketch
+        """
+
+        sketch = cls(k=k, seed=seed)
+        sketch.update(df[column])
+
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        while True:
+            full_levels = [level for level, items in enumerate(self._levels) if len(items) > self._capacity(level)]
+            if not full_levels:
+                return
+
+            level = full_levels[0]
+            if level + 1 == len(self._levels):
+                self._levels.append(np.empty(0))
+
+            items = np.sort(self._levels[level])
+            # With an odd number of items one stays at its level, so the total weight is unchanged
+            kept = len(items) % 2
+            promoted = items[kept + self._rng.integers(2)::2]
+            self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            self._levels[level] = items[:kept]
+
+    def update(self, values):
+        """
+        Adds a batch of values. Missing values are skipped.
+
+        :param values: array-like, The values
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.n += len(values)
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """
+        Adds the values summarized by another sketch, such as the sketch of another partition.
+
+        :param other: QuantileSketch, The sketch to add
+        """
+
+        self.n += other.n
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self._compress()
+
+    def _weighted_items(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level, dtype=np.int64)
+                                  for level, level_items in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """
+        Gives approximate quantiles: the value whose rank is within rank_error of q.
+
+        :param q: float or array-like, The quantiles to compute, between 0 and 1
+        :return: float or numpy.ndarray, The approximate quantiles, nan when the sketch is empty
+        """
+
+        q = np.asarray(q, dtype=np.float64)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("q must be between 0 and 1")
+        if self.n == 0:
+            return np.full(q.shape, np.nan)[()]
+
+        items, cumulative_weights = self._weighted_items()
+        positions = np.searchsorted(cumulative_weights, q * self.n, side='left')
+        quantiles = items[np.minimum(positions, len(items) - 1)]
+        # The extremes are known exactly
+        quantiles = np.where(q == 0, self.min, np.where(q == 1, self.max, quantiles))
+
+        return quantiles[()]
+
+    def rank(self, x):
+        """
+        Gives the approximate normalized rank of values: the share of the sketched values smaller or equal to them.
+
+        :param x: float or array-like, The values
+        :return: float or numpy.ndarray, The approximate ranks between 0 and 1
+        """
+
+        x = np.asarray(x, dtype=np.float64)
+        if self.n == 0:
+            return np.full(x.shape, np.nan)[()]
+
+        items, cumulative_weights = self._weighted_items()
+        positions = np.searchsorted(items, x, side='right')
+        cumulative_weights = np.concatenate([[0], cumulative_weights])
+
+        return (cumulative_weights[positions] / self.n)[()]
+
+    @property
+    def rank_error(self):
+        """
+        The approximate bound on the normalized rank error of a quantile, at 99% confidence.
+        """
+
+        return 2.296 / self.k ** 0.9723
+
+    @property
+    def size(self):
+        """
+        The number of items kept by the sketch.
+        """
+
+        return sum(len(items) for items in self._levels)
+
+
+def sketch_columns(chunks, columns, k=200, seed=0):
+    """
+    Builds the sketches of several columns in one pass over the chunks of a dataframe.
+
+    :param chunks: iterable of pandas.DataFrame, The chunks, e.g. pd.read_csv(path, chunksize=100000)
+    :param columns: list, The numerical columns to sketch
+    :param k: int, optional, The capacity of the top level of each sketch. Defaults to 200.
+    :param seed: int, optional, The seed of the compaction offsets. Defaults to 0.
+    :return: dict, The sketch of every column
+    """
+
+    sketches = {column: QuantileSketch(k=k, seed=seed) for column in columns}
+    for chunk in chunks:
+        for column in columns:
+            sketches[column].update(chunk[column])
+
+    return sketches
+
+
+def iqr_thresholds(sketch, factor=1.5):
+    """
+    Calculates the IQR outlier thresholds from the approximate quartiles of a sketch. The quartiles are values whose
+    ranks are within sketch.rank_error of 0.25 and 0.75.
+
+    :param sketch: QuantileSketch, The sketch of the values
+    :param factor: float, optional, The multiple of the IQR beyond the quartiles from which a value is an outlier.
+    Defaults to 1.5.
+    :return: tuple, The lower and upper thresholds
+    """
+
+    quantile1, quantile3 = sketch.quantile([0.25, 0.75])
+    threshold = (quantile3 - quantile1) * factor
+
+    return quantile1 - threshold, quantile3 + threshold
+
+
+def flag_outliers(chunk, thresholds):
+    """
+    Flags the outlier rows of a chunk, for the second pass over the data once the thresholds are known.
+
+    :param chunk: pandas.DataFrame, The chunk
+    :param thresholds: dict, The lower and upper thresholds of every column, see iqr_thresholds
+    :return: pandas.DataFrame, A boolean column per thresholded column, True for the outlier rows, with the index of
+    the chunk
+    """
+
+    return pd.DataFrame({column: (chunk[column] < lower) | (chunk[column] > upper)
+                         for column, (lower, upper) in thresholds.items()}, index=chunk.index)
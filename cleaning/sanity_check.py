@@ -2,6 +2,8 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import pandas as pd
 import time
+from cleaning.profiler import profile_columns, profile_report
+from cleaning.quantile_sketch import sketch_columns, iqr_thresholds, flag_outliers
 
 
 def show_unique_values(df, col):
@@ -55,7 +57,36 @@ def identifying_outliers(dataframe, column):
     return outliers
 
 
-def sanity_numerical_column(dataframe, subset):
+def identifying_outliers_in_chunks(read_chunks, columns, factor=1.5, k=200):
+    """
+    Finds the IQR outliers of numerical columns of data too large to hold in memory, in two passes over its chunks:
+    the first builds a quantile sketch per column and the second flags the rows beyond the approximate thresholds.
+
+    :param read_chunks: callable, Returns a new iterator over the chunks on every call,
+    e.g. lambda: pd.read_csv(path, chunksize=100000)
+    :param columns: list, The numerical columns to check
+    :param factor: float, optional, The multiple of the IQR beyond the quartiles from which a value is an outlier.
+    Defaults to 1.5.
+    :param k: int, optional, The accuracy of the sketches, see cleaning.quantile_sketch.QuantileSketch.
+    Defaults to 200.
+    :return: tuple, The lower and upper thresholds of every column, and the outlier rows of every column
+    """
+
+    sketches = sketch_columns(read_chunks(), columns=columns, k=k)
+    thresholds = {column: iqr_thresholds(sketch, factor=factor) for column, sketch in sketches.items()}
+
+    outliers = {column: [] for column in columns}
+    for chunk in read_chunks():
+        masks = flag_outliers(chunk, thresholds)
+        for column in columns:
+            outliers[column].append(chunk[masks[column]])
+    # Without any chunk there are no rows to concatenate, nor any columns to give the empty frames
+    outliers = {column: pd.concat(rows) if rows else pd.DataFrame() for column, rows in outliers.items()}
+
+    return thresholds, outliers
+
+
+def sanity_numerical_column(dataframe, subset, outlier_masks=None):
 
     for column_n, column in enumerate(subset, start=1):
 
@@ -69,7 +100,10 @@ def sanity_numerical_column(dataframe, subset):
             plt.tight_layout()
             plt.show()
 
-            outliers = identifying_outliers(dataframe, column)
+            if outlier_masks is not None and column in outlier_masks:
+                outliers = dataframe[outlier_masks[column]]
+            else:
+                outliers = identifying_outliers(dataframe, column)
             if not outliers.empty:
                 print(f"WARNING: Column '{column}' has {len(outliers)} outliers.")
                 print("Remove them? 'y' to remove, 'n' to leave")
@@ -124,15 +158,15 @@ def data_sanity_check(df):
 
         print(f"""Choose columns to check by writing their numbers: '1, 2, 5, 12'""")
         sanity_columns = df.columns.tolist()
-        for i, column in enumerate(sanity_columns, start=1):
-            if df[column].dtype == 'object' or df[column].dtype == 'bool':
-                number_of_unique_values = len(df[column].unique())
-                print(f"{i}. {column}. Type: {df[column].dtype}, unique values: {number_of_unique_values}")
-            elif df[column].dtype == 'int64' or df[column].dtype == 'float':
-                outliers = identifying_outliers(df, column)
-                print(f"{i}. {column}. Type: {df[column].dtype}, number of outliers: {len(outliers)}")
+        # Outliers are computed once here and reused when the numerical columns are checked
+        profile = profile_columns(df)
+        for i, row in enumerate(profile['summary'].itertuples(index=False), start=1):
+            if row.Kind == 'categorical':
+                print(f"{i}. {row.Column}. Type: {row.Type}, unique values: {row.Unique}")
+            elif row.Kind == 'numerical':
+                print(f"{i}. {row.Column}. Type: {row.Type}, number of outliers: {row.Outliers}")
             else:
-                print(f"{i}. {column}. Type: {df[column].dtype}")
+                print(f"{i}. {row.Column}. Type: {row.Type}")
         columns_input = input("""Which columns to check:
 """)
 
@@ -140,7 +174,8 @@ def data_sanity_check(df):
         columns_to_check = [sanity_columns[i] for i in columns_indexes]
 
         sanity_categorical_column(dataframe=df, subset=columns_to_check)
-        dataframe_outliers_cleaned = sanity_numerical_column(dataframe=df, subset=columns_to_check)
+        dataframe_outliers_cleaned = sanity_numerical_column(dataframe=df, subset=columns_to_check,
+                                                             outlier_masks=profile['outliers'])
         sanity_date_column(dataframe=df, subset=columns_to_check)
 
     elif sanity_check == 'n':
@@ -153,8 +188,32 @@ def data_sanity_check(df):
     return dataframe_outliers_cleaned
 
 
-def data_sanity_step(df):
-    df_corrected = data_sanity_check(df)
+def data_sanity_report(df, figure_dir=None, max_workers=4):
+    """
+    Non-interactive sanity check for batch jobs: profiles all columns, prints the profile and writes the figures to
+    figure_dir instead of showing them. No rows are removed.
+
+    :param df: pandas.DataFrame, The dataframe to check
+    :param figure_dir: str, optional, The directory of the figures. Defaults to None, no figures.
+    :param max_workers: int, optional, The number of figures rendered at the same time. Defaults to 4.
+    :return: dict, The profile, see cleaning.profiler.profile_report
+    """
+
+    profile = profile_report(df, output_dir=figure_dir, max_workers=max_workers)
+    with pd.option_context('display.max_columns', None, 'display.width', None):
+        print(profile['summary'].to_string(index=False))
+    for column, mask in profile['outliers'].items():
+        if mask.any():
+            print(f"WARNING: Column '{column}' has {int(mask.sum())} outliers.")
+
+    return profile
+
+
+def data_sanity_step(df, interactive=True, figure_dir=None):
+    if interactive:
+        df_corrected = data_sanity_check(df)
+    else:
+        data_sanity_report(df, figure_dir=figure_dir)
+        df_corrected = df
     print("")
     return df_corrected
-
@@ -0,0 +1,224 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import analytics.subscriptions as sb
+
+COLUMNS = ['User ID', 'Subscription Type', 'Period Revenue', 'Join Date', 'Payment Date', 'Country', 'Age',
+           'Gender', 'Device', 'Plan Duration']
+
+DEFAULT_SUBSCRIPTION_MIX = {'Basic': 0.79, 'Standard': 0.12, 'Premium': 0.09}
+DEFAULT_PLAN_MIX = {'1 Month': 0.6, '6 Months': 0.3, '12 Months': 0.1}
+DEFAULT_COUNTRY_MIX = {'United States': 0.18, 'Spain': 0.17, 'Canada': 0.14, 'Mexico': 0.08, 'United Kingdom': 0.075,
+                       'Australia': 0.075, 'France': 0.075, 'Italy': 0.07, 'Brazil': 0.07, 'Germany': 0.065}
+DEFAULT_DEVICE_MIX = {'Laptop': 0.26, 'Smartphone': 0.25, 'Smart TV': 0.25, 'Tablet': 0.24}
+DEFAULT_GENDER_MIX = {'Female': 0.5, 'Male': 0.5}
+# Probability that a subscriber does not renew at the end of a period, per plan duration
+DEFAULT_CHURN_HAZARD = {'1 Month': 0.15, '6 Months': 0.3, '12 Months': 0.4}
+
+# Same pricing as preliminary_dataset_corrections
+MONTHLY_PRICE = {'Basic': 4, 'Standard': 6.2, 'Premium': 7.5}
+PLAN_PRICE_MULTIPLIER = {'1 Month': 1, '6 Months': 4.2, '12 Months': 8.33}
+
+
+def _choice(rng, mix, size):
+    """
+    Draws categories with the probabilities of a mix, normalized to sum to 1.
+    """
+
+    labels = np.array(list(mix.keys()), dtype=object)
+    probabilities = np.array(list(mix.values()), dtype=np.float64)
+
+    return rng.choice(len(labels), size=size, p=probabilities / probabilities.sum()), labels
+
+
+def check_mixes(subscription_mix=None, plan_mix=None, churn_hazard=None):
+    """
+    Checks that every subscription type has a price and every plan a duration in format 'x months' and a churn
+    hazard. User hazards are merged over the default ones.
+
+    :param subscription_mix: dict, optional, The share of every subscription type
+    :param plan_mix: dict, optional, The share of every plan duration, in format 'x months'
+    :param churn_hazard: dict, optional, The probability to churn at the end of a period, per plan duration
+    :return: tuple, The subscription mix, the plan mix and the churn hazards to use
+    """
+
+    subscription_mix = subscription_mix or DEFAULT_SUBSCRIPTION_MIX
+    plan_mix = plan_mix or DEFAULT_PLAN_MIX
+    churn_hazard = {**DEFAULT_CHURN_HAZARD, **(churn_hazard or {})}
+
+    unpriced = [subscription for subscription in subscription_mix if subscription not in MONTHLY_PRICE]
+    if unpriced:
+        raise ValueError(f"subscription types must be one of {list(MONTHLY_PRICE)}, got {unpriced}")
+    sb.plan_duration_months(pd.Series(list(plan_mix)))
+    without_hazard = [plan for plan in plan_mix if plan not in churn_hazard]
+    if without_hazard:
+        raise ValueError(f"no churn hazard for plans {without_hazard}")
+
+    return subscription_mix, plan_mix, churn_hazard
+
+
+def generate_chunk(n_users, rng, first_user_id=1, start_date='2021-05-01', end_date='2023-12-31',
+                   subscription_mix=None, plan_mix=None, country_mix=None, device_mix=None,
+                   churn_hazard=None):
+    """
+    Generates the payments of a block of synthetic users in the schema of netflix.csv.
+    Every user joins on a uniform random date between start_date and end_date and pays on joining. At the end of
+    each period the user renews for another period of the same plan, unless they churn with the hazard of their plan
+    or the renewal falls after end_date.
+
+    :param n_users: int, The number of users
+    :param rng: numpy.random.Generator, The random generator
+    :param first_user_id: int, optional, The id of the first user, the others follow. Defaults to 1.
+    :param start_date: str, optional, The first join date. Defaults to '2021-05-01'.
+    :param end_date: str, optional, The last join and payment date. Defaults to '2023-12-31'.
+    :param subscription_mix: dict, optional, The share of every subscription type
+    :param plan_mix: dict, optional, The share of every plan duration, in format 'x months'
+    :param country_mix: dict, optional, The share of every country
+    :param device_mix: dict, optional, The share of every device
+    :param churn_hazard: dict, optional, The probability to churn at the end of a period, per plan duration,
+    merged over the default hazards
+    :return: pandas.DataFrame, One row per payment, sorted by user and payment date
+    """
+
+    subscription_mix, plan_mix, churn_hazard = check_mixes(subscription_mix=subscription_mix, plan_mix=plan_mix,
+                                                           churn_hazard=churn_hazard)
+
+    subscription_codes, subscriptions = _choice(rng, subscription_mix, n_users)
+    plan_codes, plans = _choice(rng, plan_mix, n_users)
+    country_codes, countries = _choice(rng, country_mix or DEFAULT_COUNTRY_MIX, n_users)
+    device_codes, devices = _choice(rng, device_mix or DEFAULT_DEVICE_MIX, n_users)
+    gender_codes, genders = _choice(rng, DEFAULT_GENDER_MIX, n_users)
+    ages = rng.integers(26, 52, size=n_users)
+
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    join_dates = (start + rng.integers(0, (end - start).astype(np.int64) + 1, size=n_users)).astype('datetime64[ns]')
+
+    plan_months = sb.plan_duration_months(pd.Series(plans)).to_numpy(dtype=np.int64)[plan_codes]
+    hazards = np.array([churn_hazard[plan] for plan in plans], dtype=np.float64)[plan_codes]
+    # Plans without a listed multiplier are priced at their number of months
+    multipliers = [PLAN_PRICE_MULTIPLIER.get(plan, int(plan.split(" ")[0])) for plan in plans]
+    period_revenue = (np.array([MONTHLY_PRICE[subscription] for subscription in subscriptions])[subscription_codes] *
+                      np.array(multipliers)[plan_codes])
+
+    # Renewal chains advance one period at a time for all still active users
+    payment_users = []
+    payment_dates = []
+    active = np.arange(n_users)
+    current_dates = join_dates
+    end = end.astype('datetime64[ns]')
+    while len(active):
+        payment_users.append(active)
+        payment_dates.append(current_dates)
+        next_dates = sb.add_months(current_dates, plan_months[active])
+        renewing = (rng.random(len(active)) >= hazards[active]) & (next_dates <= end)
+        active = active[renewing]
+        current_dates = next_dates[renewing]
+
+    payment_users = np.concatenate(payment_users)
+    payment_dates = np.concatenate(payment_dates)
+    order = np.argsort(payment_users, kind='stable')
+    users = payment_users[order]
+
+    return pd.DataFrame({
+        'User ID': first_user_id + users,
+        'Subscription Type': subscriptions[subscription_codes[users]],
+        'Period Revenue': period_revenue[users],
+        'Join Date': join_dates[users],
+        'Payment Date': payment_dates[order],
+        'Country': countries[country_codes[users]],
+        'Age': ages[users],
+        'Gender': genders[gender_codes[users]],
+        'Device': devices[device_codes[users]],
+        'Plan Duration': plans[plan_codes[users]],
+    }, columns=COLUMNS)
+
+
+def generate_dataset(path, n_users, chunk_size=250000, file_format='parquet', seed=0, **mixes):
+    """
+    Writes a synthetic subscription dataset of n_users users as a directory of part files, one per chunk of users,
+    so memory use is bounded by chunk_size whatever n_users is. The rows keep a running index, as main.py writes it.
+
+    :param path: str, The output directory
+    :param n_users: int, The number of users
+    :param chunk_size: int, optional, The number of users per part file. Defaults to 250000.
+    :param file_format: str, optional, 'parquet' or 'csv'. Defaults to 'parquet'.
+    :param seed: int, optional, The seed. Every chunk draws from its own stream spawned from it. Defaults to 0.
+    :param mixes: optional, The start_date, end_date, mixes and churn hazards passed to generate_chunk
+    :return: list, The paths of the written part files
+    """
+
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError("file_format must be 'parquet' or 'csv'")
+
+    os.makedirs(path, exist_ok=True)
+    n_chunks = -(-n_users // chunk_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    paths = []
+    rows_written = 0
+    for chunk, seed_sequence in enumerate(seed_sequences):
+        first_user = chunk * chunk_size
+        df = generate_chunk(n_users=min(chunk_size, n_users - first_user), rng=np.random.default_rng(seed_sequence),
+                            first_user_id=first_user + 1, **mixes)
+        df.index = pd.RangeIndex(rows_written, rows_written + len(df))
+        rows_written += len(df)
+
+        part_path = os.path.join(path, f'part-{chunk:05d}.{file_format}')
+        if file_format == 'parquet':
+            df.to_parquet(part_path)
+        else:
+            df.to_csv(part_path)
+        paths.append(part_path)
+        print(f"Chunk {chunk + 1}/{n_chunks}: {len(df)} payments written to {part_path}")
+
+    return paths
+
+
+def _parse_mix(text):
+    """
+    Parses a mix given as 'Basic=0.8,Standard=0.1,Premium=0.1'.
+    """
+
+    mix = {}
+    for item in text.split(','):
+        if '=' not in item:
+            raise argparse.ArgumentTypeError(f"expected 'label=share', got '{item}'")
+        label, share = item.rsplit('=', 1)
+        try:
+            mix[label.strip()] = float(share)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"share of '{label.strip()}' must be a number, got '{share}'")
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a synthetic subscription dataset in the netflix.csv schema.')
+    parser.add_argument('path', help='output directory of the part files')
+    parser.add_argument('--users', type=int, default=1000000, help='number of users')
+    parser.add_argument('--chunk-size', type=int, default=250000, help='number of users per part file')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help='format of the part files')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start-date', default='2021-05-01', help='first join date')
+    parser.add_argument('--end-date', default='2023-12-31', help='last join and payment date')
+    parser.add_argument('--subscription-mix', type=_parse_mix, help="e.g. 'Basic=0.79,Standard=0.12,Premium=0.09'")
+    parser.add_argument('--plan-mix', type=_parse_mix, help="e.g. '1 Month=0.6,6 Months=0.3,12 Months=0.1'")
+    parser.add_argument('--country-mix', type=_parse_mix, help="e.g. 'United States=0.5,Canada=0.5'")
+    parser.add_argument('--device-mix', type=_parse_mix, help="e.g. 'Laptop=0.5,Smartphone=0.5'")
+    parser.add_argument('--churn-hazard', type=_parse_mix,
+                        help="churn probability per period and plan, e.g. '1 Month=0.15,6 Months=0.3,12 Months=0.4'")
+    args = parser.parse_args()
+    try:
+        check_mixes(subscription_mix=args.subscription_mix, plan_mix=args.plan_mix, churn_hazard=args.churn_hazard)
+    except ValueError as error:
+        parser.error(str(error))
+
+    generate_dataset(path=args.path, n_users=args.users, chunk_size=args.chunk_size, file_format=args.format,
+                     seed=args.seed, start_date=args.start_date, end_date=args.end_date,
+                     subscription_mix=args.subscription_mix, plan_mix=args.plan_mix, country_mix=args.country_mix,
+                     device_mix=args.device_mix, churn_hazard=args.churn_hazard)
+
+
+if __name__ == "__main__":
+    main()